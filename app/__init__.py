@@ -1,32 +1,84 @@
 import os
-from flask import Flask, send_from_directory
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
 from flask_migrate import Migrate
 from flask_login import LoginManager
 
-from .models import db, User
+from .config import Config
+from .models import db, pool_stats, user_identities
+from .abacus import box_events, box_states, history, transitions, wire_cache
+from .cache import project_cache
+from .passwords import hasher, DEFAULT_METHOD
+from .uploads import OBJECT_NAME, upload_store, upload_commands
+from .static_assets import static_assets
+from .metrics import instrumentation
 
 app = Flask(__name__)
 
-app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret")
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///dev.db")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Database URL, pool sizing, statement timeouts and the read replica
+app.config.from_object(Config)
+app.config["ABACUS_STATE_STORE"] = os.environ.get("ABACUS_STATE_STORE", "db")
+app.config["ABACUS_CACHE_SIZE"] = int(os.environ.get("ABACUS_CACHE_SIZE", 1024))
+app.config["ABACUS_IDLE_TIMEOUT"] = int(os.environ.get("ABACUS_IDLE_TIMEOUT", 1800))
+app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD)
+app.config["USER_CACHE_SIZE"] = int(os.environ.get("USER_CACHE_SIZE", 4096))
+app.config["USER_CACHE_TTL"] = int(os.environ.get("USER_CACHE_TTL", 60))
+# Redis URL for cached project responses; without it each worker keeps its
+# own LRU and can serve another worker's stale writes for RESPONSE_CACHE_TTL
+app.config["RESPONSE_CACHE_URL"] = os.environ.get("RESPONSE_CACHE_URL")
+app.config["RESPONSE_CACHE_TTL"] = int(os.environ.get("RESPONSE_CACHE_TTL", 300))
+app.config["RESPONSE_CACHE_SIZE"] = int(os.environ.get("RESPONSE_CACHE_SIZE", 1024))
+app.config["ABACUS_TRANSITION_CACHE_SIZE"] = int(os.environ.get("ABACUS_TRANSITION_CACHE_SIZE", 4096))
+# Redis URL to fan box events out across workers; in-process when unset
+app.config["ABACUS_EVENTS_URL"] = os.environ.get("ABACUS_EVENTS_URL")
+app.config["ABACUS_EVENTS_HEARTBEAT"] = float(os.environ.get("ABACUS_EVENTS_HEARTBEAT", 15))
+# Event streams hold a worker thread each; app.asgi turns them on
+app.config["ABACUS_STREAMING"] = os.environ.get("ABACUS_STREAMING", "0") == "1"
+app.config["ABACUS_SHARE_TTL"] = int(os.environ.get("ABACUS_SHARE_TTL", 24 * 3600))
+app.config["ABACUS_WIRE_CACHE_SIZE"] = int(os.environ.get("ABACUS_WIRE_CACHE_SIZE", 1024))
+# Request timing, SQL counts and /api/metrics; off unless METRICS_ENABLED=1
+app.config["METRICS_ENABLED"] = os.environ.get("METRICS_ENABLED", "0") == "1"
+app.config["PROFILE_SAMPLE_RATE"] = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+app.config["SLOW_REQUEST_SECONDS"] = float(os.environ.get("SLOW_REQUEST_SECONDS", 1.0))
+# Request threads per process when served through app.asgi (see there)
+app.config["ASGI_THREADS"] = int(os.environ.get("ASGI_THREADS", 16))
+app.config["ASGI_CPU_THREADS"] = int(os.environ.get("ASGI_CPU_THREADS", 2))
+app.config["ASGI_STREAM_THREADS"] = int(os.environ.get("ASGI_STREAM_THREADS", 256))
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 UPLOAD_FOLDER = os.path.abspath(os.path.join(BASE_DIR, "..", "uploads"))
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 16 * 1024 * 1024))
 
 db.init_app(app)
 Migrate(app, db)
+# Registered first so its after_request hook runs last and times the whole request
+instrumentation.init_app(app)
+instrumentation.gauge("abacus_box_cache", box_states.stats)
+instrumentation.gauge("abacus_transition_cache", transitions.stats)
+instrumentation.gauge("user_identity_cache", user_identities.stats)
+instrumentation.gauge("db_pool", pool_stats)
+instrumentation.gauge("abacus_events", box_events.stats)
+instrumentation.gauge("abacus_wire_cache", wire_cache.stats)
+box_states.init_app(app)
+history.init_app(app)
+box_events.init_app(app)
+wire_cache.init_app(app)
+transitions.init_app(app)
+project_cache.init_app(app)
 
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 login_manager.init_app(app)
+user_identities.init_app(app)
+hasher.init_app(app)
+upload_store.init_app(app)
+static_assets.init_app(app, os.path.join(BASE_DIR, "..", "react-vite", "dist"))
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_identities.load(int(user_id))
 
 # Configure CORS for production and development
 allowed_origins = ["http://localhost:5173", "http://127.0.0.1:5173"]
@@ -43,12 +95,19 @@ CORS(
 from .api.abacus_routes import abacus_routes
 from .api.project_routes import project_routes
 from .api.auth_routes import auth_routes
+from .api.upload_routes import upload_routes
 from .seeds import seed_commands
+from .bench import bench_commands
+from .transfer import project_commands
 
 app.register_blueprint(abacus_routes)
 app.register_blueprint(project_routes)
 app.register_blueprint(auth_routes)
+app.register_blueprint(upload_routes)
 app.cli.add_command(seed_commands)
+app.cli.add_command(bench_commands)
+app.cli.add_command(project_commands)
+app.cli.add_command(upload_commands)
 
 @app.after_request
 def set_csrf_cookie(response):
@@ -66,16 +125,14 @@ def set_csrf_cookie(response):
 
 @app.get("/uploads/<path:filename>")
 def uploads(filename):
+    if OBJECT_NAME.match(filename):
+        return upload_store.serve(filename, request.args.get("w", type=int))
+    # Files saved before the content-addressed store
     return send_from_directory(app.config["UPLOAD_FOLDER"], filename)
 
 # Serve React frontend
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_frontend(path):
-    # Serve static files from React build
-    static_folder = os.path.join(BASE_DIR, "..", "react-vite", "dist")
-    
-    if path != "" and os.path.exists(os.path.join(static_folder, path)):
-        return send_from_directory(static_folder, path)
-    else:
-        return send_from_directory(static_folder, "index.html")
+    # Served from the manifest built at startup; unknown paths get index.html
+    return static_assets.serve(path)
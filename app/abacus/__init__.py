@@ -0,0 +1,23 @@
+from .box import Box
+from .array_box import ArrayBox
+
+# Storage backends selectable per box, keyed by the name clients send
+STORAGE = {"dict": Box, "array": ArrayBox}
+
+from .transitions import TransitionCache, transitions
+from .history import History, history
+from .state import BoxCache, DbStateStore, MemoryStateStore, VersionConflict, box_states
+from .events import BoxEvents, box_events
+from .wire import WireCache, wire_cache
+from .batch import BoxBatch
+from .numeric import box_from_text, box_from_value, box_value, convert_value, format_box, format_value, parse_value
+
+__all__ = [
+    "Box", "ArrayBox", "STORAGE", "BoxBatch",
+    "BoxCache", "DbStateStore", "MemoryStateStore", "VersionConflict", "box_states",
+    "TransitionCache", "transitions",
+    "History", "history",
+    "BoxEvents", "box_events",
+    "WireCache", "wire_cache",
+    "box_from_text", "box_from_value", "box_value", "convert_value", "format_box", "format_value", "parse_value",
+]
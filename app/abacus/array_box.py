@@ -0,0 +1,190 @@
+from array import array
+from itertools import groupby
+
+from app.metrics import timed
+
+# Bases up to 65536, two bytes a row
+MAX_WIDTH = (1 << 16) - 1
+# Rows between the lowest and highest occupied one, blanks included
+MAX_SPAN = 1 << 20
+
+
+def _typecode(W):
+    if W <= MAX_WIDTH:
+        return 'H'
+    raise ValueError(f"array storage holds bases up to {MAX_WIDTH + 1}")
+
+
+def _check_span(span):
+    if span > MAX_SPAN:
+        raise ValueError(f"array storage holds rows at most {MAX_SPAN} apart")
+
+
+class ArrayBox:
+    """Box stored as one contiguous run of counts starting at row `offset`.
+
+    Blank rows inside the run are zeros; the run is trimmed so both ends are
+    occupied. Shifts only move `offset`, and per-row updates go through a
+    lookup table over the counts present so they stay in C. Suited to densely
+    occupied boxes; rows far apart allocate everything in between, so widths
+    are capped at MAX_WIDTH and runs at MAX_SPAN rows.
+    """
+
+    def __init__(self, W: int, rows: dict = None, P: int = None):
+        self.W = W
+        self.P = P
+        self.rows = rows or {}
+
+    @classmethod
+    def init(cls, base: int):
+        assert base >= 2
+        W = base - 1
+        return cls(W=W, rows={}, P=W)
+
+    def copy(self):
+        box = ArrayBox.__new__(ArrayBox)
+        box.W, box.P, box.offset, box.counts = self.W, self.P, self.offset, array(self.counts.typecode, self.counts)
+        return box
+
+    def canonical(self):
+        offset = self.offset
+        return (self.W, self.P, tuple((offset + i, c) for i, c in enumerate(self.counts) if c))
+
+    def occupied(self):
+        return len(self.counts)
+
+    @property
+    def rows(self):
+        return {self.offset + i: c for i, c in enumerate(self.counts) if c}
+
+    @rows.setter
+    def rows(self, rows):
+        occupied = {y: c for y, c in rows.items() if c > 0}
+        if any(c > self.W for c in occupied.values()):
+            raise ValueError("row count exceeds box width")
+        self.offset = min(occupied) if occupied else 0
+        size = max(occupied) - self.offset + 1 if occupied else 0
+        _check_span(size)
+        self.counts = array(_typecode(self.W), [0]) * size
+        for y, c in occupied.items():
+            self.counts[y - self.offset] = c
+
+    def _trim(self):
+        counts = self.counts
+        end = len(counts)
+        while end and not counts[end-1]:
+            end -= 1
+        start = 0
+        while start < end and not counts[start]:
+            start += 1
+        if start or end < len(counts):
+            self.counts = counts[start:end]
+            self.offset = self.offset + start if end else 0
+
+    def _map(self, fn, typecode=None):
+        lut = {c: fn(c) for c in set(self.counts)}
+        self.counts = array(typecode or self.counts.typecode, map(lut.__getitem__, self.counts))
+
+    def _reset_divider(self):
+        self.P = self.W
+
+    def _set(self, y: int, c: int):
+        counts = self.counts
+        if not counts:
+            if c:
+                self.offset = y
+                self.counts = array(counts.typecode, [c])
+            return
+        i = y - self.offset
+        if 0 <= i < len(counts):
+            counts[i] = c
+            if not c:
+                self._trim()
+        elif c:
+            _check_span(len(counts) - i if i < 0 else i + 1)
+            zeros = array(counts.typecode, [0]) * (-i - 1 if i < 0 else i - len(counts))
+            if i < 0:
+                self.counts = array(counts.typecode, [c]) + zeros + counts
+                self.offset = y
+            else:
+                counts.extend(zeros)
+                counts.append(c)
+
+    def _get(self, y: int):
+        i = y - self.offset
+        return self.counts[i] if 0 <= i < len(self.counts) else 0
+
+    def add(self, y: int, k: int):
+        self._reset_divider()
+        self._set(y, min(self.W, self._get(y) + max(0, k)))
+
+    def sub(self, y: int, k: int):
+        self._reset_divider()
+        self._set(y, max(0, self._get(y) - max(0, k)))
+
+    def mul2(self, steps: int):
+        steps = max(0, steps)
+        if not steps:
+            return
+        self._reset_divider()
+        if not self.counts:
+            return
+        low = min(filter(None, self.counts))
+        doublings = 0
+        while (low << doublings) < self.W:
+            doublings += 1
+        if steps <= doublings:
+            W = self.W
+            self._map(lambda c: min(W, c << steps))
+            return
+        if doublings:
+            W = self.W
+            self._map(lambda c: W if c else 0)
+        self.offset += steps - doublings
+
+    def div2(self, steps: int):
+        steps = max(0, steps)
+        if not steps:
+            return
+        if not self.counts:
+            self._reset_divider()
+            return
+        if max(self.counts) >= 2:
+            P = self.P if self.P is not None else self.W
+            halvings = max(1, P.bit_length() - 1) if P > 0 else 1
+            n = min(steps, halvings)
+            self.P = P = max(1, P >> n)
+            self._map(lambda c: min(c, P))
+            steps -= n
+            if not steps:
+                return
+        low = self.offset
+        if low == 0:
+            return
+        if low > 0:
+            steps = min(steps, low)
+        self.offset -= steps
+
+    def convert_base(self, base: int):
+        assert base >= 2
+        Wp = base - 1
+        self._map(lambda c: min(c, Wp), _typecode(Wp))
+        self.W = Wp
+        self.P = self.W
+        self._trim()
+
+    def to_runs(self):
+        """(lowest row, [count, length, count, length, ...]) from the lowest row up"""
+        runs = []
+        for c, group in groupby(self.counts):
+            runs += [c, sum(1 for _ in group)]
+        return self.offset, runs
+
+    @timed("box")
+    def to_json(self):
+        offset = self.offset
+        return {
+            "width": self.W,
+            "divider": self.P,
+            "rows": [[offset + i, c] for i, c in enumerate(self.counts) if c]
+        }
@@ -0,0 +1,309 @@
+"""Many boxes run through the same operations at once, for exercise batches.
+
+A BoxBatch holds N boxes as a box x row grid, one Python int per row: the
+counts of that row in every box sit side by side in fixed-width lanes
+(8, 16, 32 or 64 bits, whatever the widest box needs). Adding to a row,
+saturating at each box's width, clipping to each box's divider and the
+per-box minimum or maximum over all rows are then a few big-int
+operations that CPython runs over every box in one pass, instead of N
+interpreter-level calls. Rows move between ints only for shifts, one
+mask per distinct shift.
+
+Each lane keeps its top bit clear as a guard, which is what makes the
+lane-wise comparisons work: ((a | guard) - b) & guard has the guard bit of
+a lane set exactly where a >= b, and nothing borrows across lanes.
+
+Results are identical to applying the same ops to each Box, including the
+divider and the all-full (mul2) and all-single (div2) branches.
+"""
+import sys
+from array import array
+
+from .box import Box
+
+LANE_BITS = (8, 16, 32, 64)
+_TYPECODES = {array(tc).itemsize * 8: tc for tc in "QLIHB"}
+
+
+def _lane_bits(W):
+    # Two spare bits: one for a sum of two counts, one for the guard
+    for bits in LANE_BITS:
+        if W.bit_length() + 2 <= bits:
+            return bits
+    raise ValueError("width does not fit a box batch")
+
+
+class BoxBatch:
+    """N boxes, possibly of different bases, advanced by the same ops."""
+
+    def __init__(self, n, bits):
+        self.n = n
+        self._set_layout(bits)
+        self._W = self._P = self._unset = 0
+        self._rows = {}
+
+    def _set_layout(self, bits):
+        self.bits = bits
+        self._typecode = _TYPECODES[bits]
+        self._ones = self._pack([1] * self.n)
+        self._guard = self._ones << (bits - 1)
+        # Every bit of every lane below the guard
+        self._low = self._guard - self._ones
+        # Anything larger saturates the same way, and a sum of two fits a lane
+        self._limit = (1 << (bits - 2)) - 1
+
+    @classmethod
+    def init(cls, n, base):
+        """n empty boxes of the given base"""
+        assert base >= 2
+        batch = cls(n, _lane_bits(base - 1))
+        batch._W = batch._P = (base - 1) * batch._ones
+        return batch
+
+    @classmethod
+    def from_boxes(cls, boxes):
+        boxes = list(boxes)
+        batch = cls(len(boxes), _lane_bits(max((box.W for box in boxes), default=1)))
+        zero = array(batch._typecode, [0])
+        widths, dividers, unset, planes = zero * len(boxes), zero * len(boxes), zero * len(boxes), {}
+        for i, box in enumerate(boxes):
+            if box.W < 1:
+                raise ValueError("box width must be at least 1")
+            widths[i] = box.W
+            if box.P is None:
+                unset[i] = 1
+            elif not 0 <= box.P <= box.W:
+                raise ValueError("divider must be between 0 and the box width")
+            else:
+                dividers[i] = box.P
+            for y, c in box.rows.items():
+                if c > box.W:
+                    raise ValueError("row count exceeds box width")
+                if c > 0:
+                    if y not in planes:
+                        planes[y] = zero * len(boxes)
+                    planes[y][i] = c
+        batch._W = batch._pack(widths)
+        batch._P = batch._pack(dividers)
+        batch._unset = batch._nonzero(batch._pack(unset))
+        batch._rows = {y: batch._pack(plane) for y, plane in planes.items()}
+        return batch
+
+    def boxes(self, storage=Box):
+        """The boxes as storage instances, in the order they were given"""
+        widths, dividers, unset = self._unpack(self._W), self._unpack(self._P), self._unpack(self._unset)
+        rows = [{} for _ in range(self.n)]
+        for y in sorted(self._rows):
+            for i, c in enumerate(self._unpack(self._rows[y])):
+                if c:
+                    rows[i][y] = c
+        return [
+            storage(W=widths[i], rows=rows[i], P=None if unset[i] else dividers[i])
+            for i in range(self.n)
+        ]
+
+    def copy(self):
+        batch = BoxBatch.__new__(BoxBatch)
+        batch.__dict__.update(self.__dict__)
+        batch._rows = dict(self._rows)
+        return batch
+
+    def __len__(self):
+        return self.n
+
+    def _pack(self, values):
+        lanes = array(self._typecode, values)
+        if sys.byteorder == "big":
+            lanes.byteswap()
+        return int.from_bytes(lanes.tobytes(), "little")
+
+    def _unpack(self, x):
+        lanes = array(self._typecode)
+        lanes.frombytes(x.to_bytes(self.n * self.bits // 8, "little"))
+        if sys.byteorder == "big":
+            lanes.byteswap()
+        return lanes
+
+    # Lane-wise helpers; "masks" have every non-guard bit of the selected lanes set
+
+    def _ge(self, a, b):
+        """Mask of the lanes where a >= b"""
+        flags = ((a | self._guard) - b) & self._guard
+        return flags - (flags >> (self.bits - 1))
+
+    def _nonzero(self, a):
+        return self._ge(a, self._ones)
+
+    def _min(self, a, b):
+        return a ^ ((a ^ b) & self._ge(a, b))
+
+    def _max(self, a, b):
+        return a ^ ((a ^ b) & self._ge(b, a))
+
+    def _store(self, y, counts):
+        if counts:
+            self._rows[y] = counts
+        else:
+            self._rows.pop(y, None)
+
+    def _reset_divider(self, mask=None):
+        if mask is None:
+            self._P, self._unset = self._W, 0
+        else:
+            self._P ^= (self._P ^ self._W) & mask
+            self._unset ^= self._unset & mask
+
+    def add(self, y: int, k: int):
+        self._reset_divider()
+        k = min(max(0, k), self._limit)
+        self._store(y, self._min(self._rows.get(y, 0) + k * self._ones, self._W))
+
+    def sub(self, y: int, k: int):
+        self._reset_divider()
+        k = min(max(0, k), self._limit)
+        c = self._rows.get(y, 0)
+        self._store(y, c - self._min(c, k * self._ones))
+
+    def mul2(self, steps: int):
+        steps = max(0, steps)
+        if not steps:
+            return
+        self._reset_divider()
+        if not self._rows:
+            return
+        W, ones, lanes = self._W, self._ones, self._low
+        # Lowest count per box, less one: ((c | guard) - 1) turns blank lanes
+        # into the lane maximum. Empty boxes count as full.
+        least = W - ones
+        for c in self._rows.values():
+            least = self._min(least, ((c | self._guard) - ones) & lanes)
+        low = least + ones
+        # Boxes whose lowest count reaches W after d < steps doublings fill up
+        # and shift by steps - d; the rest double every row steps times
+        shifts, full = {}, 0
+        for d in range(min(steps, self.bits)):
+            reached = self._ge(low, W)
+            if reached != full:
+                shifts[steps - d] = reached ^ full
+                full = reached
+                if full == lanes:
+                    break
+            low = self._min(low << 1, W)
+        doubling = lanes ^ full
+
+        rows = {}
+        for y, c in self._rows.items():
+            if doubling:
+                # Only reachable with steps below the lane width
+                part = c & doubling if full else c
+                for _ in range(steps):
+                    part = self._min(part << 1, W)
+                if part:
+                    rows[y] = rows.get(y, 0) | part
+            if shifts:
+                filled = W & self._nonzero(c)
+                for shift, mask in shifts.items():
+                    part = filled & mask
+                    if part:
+                        rows[y + shift] = rows.get(y + shift, 0) | part
+        self._rows = rows
+
+    def div2(self, steps: int):
+        steps = max(0, steps)
+        if not steps:
+            return
+        lanes = self._low
+        high = 0
+        for c in self._rows.values():
+            high = self._max(high, c)
+        occupied = self._nonzero(high)
+        if occupied != lanes:
+            self._reset_divider(lanes ^ occupied)
+        if not occupied:
+            return
+
+        # Boxes holding a count of 2 or more halve the divider (clipping rows)
+        # until it reaches 1, using up to log2(P) steps
+        remaining = {steps: occupied}
+        halving = self._ge(high, 2 * self._ones)
+        if halving:
+            ones, W = self._ones, self._W
+            start = self._P ^ ((self._P ^ W) & self._unset)  # no divider yet counts as W
+            P = start
+            for _ in range(min(steps, self.bits)):
+                P = (P >> 1) & lanes
+            P = self._max(P, ones)
+            self._P ^= (self._P ^ P) & halving
+            self._unset ^= self._unset & halving
+            cap = W ^ ((W ^ P) & halving)
+            self._rows = {y: self._min(c, cap) for y, c in self._rows.items()}
+
+            remaining[steps] = occupied ^ halving
+            # halvings = max(1, bit_length(P) - 1): 1 below 4, then one per
+            # bit; boxes with as many halvings as steps are done
+            at_least = self._ge(start, 4 * ones)
+            groups = [(1, lanes ^ at_least)]
+            for b in range(3, min(self.bits - 1, steps + 1)):
+                above = self._ge(start, (1 << b) * ones)
+                groups.append((b - 1, at_least ^ above))
+                at_least = above
+            for halvings, mask in groups:
+                mask &= halving
+                if mask and steps > halvings:
+                    remaining[steps - halvings] = remaining.get(steps - halvings, 0) | mask
+
+        # ... then single beads shift down until the lowest row sits at 0
+        remaining = {left: mask for left, mask in remaining.items() if mask}
+        moves, seen = {}, 0
+        for y in sorted(self._rows) if remaining else ():
+            nonzero = self._nonzero(self._rows[y])
+            lowest = nonzero ^ (nonzero & seen)
+            seen |= lowest
+            if lowest and y != 0:
+                for left, mask in remaining.items():
+                    mask &= lowest
+                    shift = left if y < 0 else min(left, y)
+                    if mask and shift:
+                        moves[shift] = moves.get(shift, 0) | mask
+            if seen == occupied:
+                break
+        if not moves:
+            return
+        moving = 0
+        for mask in moves.values():
+            moving |= mask
+        rows = {}
+        for y, c in self._rows.items():
+            stay = c ^ (c & moving)
+            if stay:
+                rows[y] = rows.get(y, 0) | stay
+            for shift, mask in moves.items():
+                part = c & mask
+                if part:
+                    rows[y - shift] = rows.get(y - shift, 0) | part
+        self._rows = rows
+
+    def convert_base(self, base: int):
+        assert base >= 2
+        Wp = base - 1
+        bits = _lane_bits(Wp)
+        if Wp <= self._limit:
+            cap = Wp * self._ones
+            self._rows = {y: self._min(c, cap) for y, c in self._rows.items()}
+        if bits != self.bits:
+            # Counts fit the new lanes: they were clipped, or the lanes grow
+            planes = {y: self._unpack(c) for y, c in self._rows.items()}
+            self._set_layout(bits)
+            self._rows = {y: self._pack(plane) for y, plane in planes.items()}
+        self._W = Wp * self._ones
+        self._reset_divider()
+
+    def apply(self, op):
+        """Apply one op tuple as logged in the history, e.g. ("add", 0, 2)"""
+        name, *args = op
+        if name in ("add", "sub", "mul2", "div2"):
+            getattr(self, name)(*args)
+        elif name == "convert":
+            self.convert_base(*args)
+        else:
+            raise ValueError(f"{name} cannot be applied to a batch")
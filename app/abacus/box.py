@@ -0,0 +1,170 @@
+from dataclasses import dataclass, field
+
+from app.metrics import timed
+
+
+@dataclass
+class Box:
+    W: int
+    rows: dict = field(default_factory=dict)  # y -> count
+    P: int = None
+
+    @classmethod
+    def init(cls, base: int):
+        assert base >= 2
+        W = base - 1
+        return cls(W=W, rows={}, P=W)
+
+    def copy(self):
+        return Box(W=self.W, rows=dict(self.rows), P=self.P)
+
+    def canonical(self):
+        return (self.W, self.P, tuple(sorted(self.rows.items())))
+
+    def occupied(self):
+        return len(self.rows)
+
+    def _compact(self):
+        for y in list(self.rows):
+            if self.rows[y] <= 0:
+                del self.rows[y]
+
+    def _reset_divider(self):
+        self.P = self.W
+
+    def add(self, y: int, k: int):
+        self._reset_divider()
+        c = self.rows.get(y, 0)
+        self.rows[y] = min(self.W, c + max(0, k))
+        self._compact()
+
+    def sub(self, y: int, k: int):
+        self._reset_divider()
+        c = self.rows.get(y, 0)
+        self.rows[y] = max(0, c - max(0, k))
+        self._compact()
+
+    def _all_full(self):
+        nonblank = [c for c in self.rows.values() if c > 0]
+        return len(nonblank) > 0 and all(c == self.W for c in nonblank)
+
+    def _in_range(self):
+        return all(0 < c <= self.W for c in self.rows.values())
+
+    def _mul2_step(self):
+        self._reset_divider()
+        if self._all_full():
+            self.rows = {y+1: c for y, c in self.rows.items() if c > 0}
+        else:
+            for y in list(self.rows):
+                c = self.rows[y]
+                if c > 0:
+                    self.rows[y] = min(self.W, 2*c)
+        self._compact()
+
+    def mul2(self, steps: int):
+        steps = max(0, steps)
+        # One literal step brings hand-built rows (blank or over-width) into range
+        if steps and not self._in_range():
+            self._mul2_step()
+            steps -= 1
+        if not steps:
+            return
+        self._reset_divider()
+        if not self.rows:
+            return
+        # Rows double until every one saturates at W, then the whole box shifts up
+        low = min(self.rows.values())
+        doublings = 0
+        while (low << doublings) < self.W:
+            doublings += 1
+        if steps <= doublings:
+            self.rows = {y: min(self.W, c << steps) for y, c in self.rows.items()}
+            return
+        steps -= doublings
+        self.rows = {y + steps: self.W for y in self.rows}
+
+    def _all_single_or_blank(self):
+        nonblank = [c for c in self.rows.values() if c > 0]
+        return len(nonblank) > 0 and all(c <= 1 for c in nonblank)
+
+    def _div2_step(self):
+        """Apply one div2 step; returns False when the step loop would stop."""
+        if not self.rows:
+            self._reset_divider()
+            return False
+        if any(c >= 2 for c in self.rows.values()):
+            self.P = max(1, (self.P if self.P is not None else self.W) // 2)
+            for y in list(self.rows):
+                self.rows[y] = min(self.rows[y], self.P)
+            self._compact()
+        else:
+            low = min(self.rows) if self.rows else 0
+            if low == 0:
+                return False
+            self.rows = {y-1: c for y, c in self.rows.items() if c > 0}
+            self._compact()
+        return True
+
+    def div2(self, steps: int):
+        steps = max(0, steps)
+        if steps and not self._in_range():
+            if not self._div2_step():
+                return
+            steps -= 1
+        if not steps:
+            return
+        if not self.rows:
+            self._reset_divider()
+            return
+        # The divider halves (clipping rows) until it reaches 1 ...
+        if max(self.rows.values()) >= 2:
+            P = self.P if self.P is not None else self.W
+            halvings = max(1, P.bit_length() - 1) if P > 0 else 1
+            n = min(steps, halvings)
+            self.P = max(1, P >> n)
+            self.rows = {y: min(c, self.P) for y, c in self.rows.items()}
+            steps -= n
+            if not steps:
+                return
+        # ... then single beads shift down until the lowest row sits at 0
+        low = min(self.rows)
+        if low == 0:
+            return
+        if low > 0:
+            steps = min(steps, low)
+        self.rows = {y - steps: c for y, c in self.rows.items()}
+
+    def convert_base(self, base: int):
+        assert base >= 2
+        Wp = base - 1
+        for y in list(self.rows):
+            self.rows[y] = min(self.rows[y], Wp)
+        self.W = Wp
+        self.P = self.W
+        self._compact()
+
+    def to_runs(self):
+        """(lowest row, [count, length, count, length, ...]) from the lowest row up"""
+        if not self.rows:
+            return 0, []
+        items = sorted(self.rows.items())
+        low = items[0][0]
+        runs, y = [], low
+        for row, c in items:
+            if row > y:
+                runs += [0, row - y]
+            if runs and runs[-2] == c and row == y:
+                runs[-1] += 1
+            else:
+                runs += [c, 1]
+            y = row + 1
+        return low, runs
+
+    @timed("box")
+    def to_json(self):
+        return {
+            "width": self.W,
+            "divider": self.P,
+            "rows": sorted([[int(y), int(c)] for y, c in self.rows.items()], key=lambda t: t[0])
+        }
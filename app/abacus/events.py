@@ -0,0 +1,193 @@
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from app.models import db
+from .state import box_states
+
+# Attempts, a short sleep apart, to read a version another worker has
+# announced but not yet written back
+RESYNC_ATTEMPTS = 10
+
+
+def box_diff(old, new):
+    """Rows whose count changed (0 = row emptied), plus W and P if they changed"""
+    old_rows, new_rows = old.rows, new.rows
+    rows = [[y, c] for y, c in new_rows.items() if old_rows.get(y) != c]
+    rows += [[y, 0] for y in old_rows if y not in new_rows]
+    diff = {"rows": sorted(rows)}
+    if old.W != new.W:
+        diff["width"] = new.W
+    if old.P != new.P:
+        diff["divider"] = new.P
+    return diff
+
+
+class LocalBroker:
+    """In-process pub/sub: publish calls every subscriber of the channel inline."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers[channel].add(callback)
+
+    def unsubscribe(self, channel, callback):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(callback)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def wanted(self, channel):
+        """Whether publishing to channel can reach anyone"""
+        return channel in self._subscribers
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "channels": len(self._subscribers),
+                "watchers": sum(len(s) for s in self._subscribers.values()),
+            }
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for callback in subscribers:
+            callback(message)
+
+
+class RedisBroker(LocalBroker):
+    """Relays through Redis pub/sub, so watchers on every worker see each publish.
+
+    Each process keeps one pattern subscription and hands the messages it
+    receives to its local subscribers.
+    """
+
+    PREFIX = "abacus:"
+
+    def __init__(self, url):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("ABACUS_EVENTS_URL requires the redis package")
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def _listen(self):
+        # Started lazily: pub/sub threads do not survive a gunicorn fork
+        with self._listener_lock:
+            if self._listener is None:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(**{f"{self.PREFIX}*": self._relay})
+                self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _relay(self, message):
+        channel = message["channel"].decode()[len(self.PREFIX):]
+        self._deliver(channel, message["data"].decode())
+
+    def subscribe(self, channel, callback):
+        self._listen()
+        super().subscribe(channel, callback)
+
+    def wanted(self, channel):
+        # Watchers may be on any worker
+        return True
+
+    def publish(self, channel, message):
+        self._client.publish(self.PREFIX + channel, message)
+
+
+class BoxEvents:
+    """Pushes every published box version to its watchers as a diff.
+
+    The diff is computed and encoded once per mutation, however many clients
+    watch. Each watcher gets a bounded queue; one that falls behind, or
+    misses a version, is sent the full state again instead of stalling
+    publishers.
+    """
+
+    def __init__(self, heartbeat=15, queue_size=64):
+        self.broker = LocalBroker()
+        self.heartbeat = heartbeat
+        self.queue_size = queue_size
+
+    def init_app(self, app):
+        url = app.config.setdefault("ABACUS_EVENTS_URL", None)
+        self.heartbeat = app.config.setdefault("ABACUS_EVENTS_HEARTBEAT", self.heartbeat)
+        self.broker = RedisBroker(url) if url else LocalBroker()
+
+    def publish(self, key, version, old, new):
+        if self.broker.wanted(key):
+            payload = json.dumps({"version": version, **box_diff(old, new)}, separators=(",", ":"))
+            # Prefixed with the version so watchers need not parse the JSON
+            self.broker.publish(key, f"{version} {payload}")
+
+    def stats(self):
+        return self.broker.stats()
+
+    def stream(self, key, last_event_id=None):
+        """Server-sent events for the box under key.
+
+        Starts with a `state` event holding the whole box (skipped when the
+        client reconnects with a Last-Event-ID equal to the current version),
+        then sends one `diff` event per version. Event ids are versions.
+        """
+        inbox = queue.Queue(self.queue_size)
+        overflowed = threading.Event()
+
+        def receive(message):
+            try:
+                inbox.put_nowait(message)
+            except queue.Full:
+                overflowed.set()
+
+        def state_event(min_version=0):
+            for _ in range(RESYNC_ATTEMPTS):
+                box, version = box_states.get(key, min_version)
+                if version >= min_version:
+                    break
+                time.sleep(0.05)
+            # Don't hold a pooled connection for the life of the stream
+            db.session.remove()
+            payload = json.dumps({"version": version, **box.to_json()}, separators=(",", ":"))
+            return version, f"event: state\nid: {version}\ndata: {payload}\n\n"
+
+        # Subscribe before reading the state so no version falls in between
+        self.broker.subscribe(key, receive)
+        try:
+            seen, event = state_event()
+            if last_event_id != str(seen):
+                yield event
+            while True:
+                try:
+                    message = inbox.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                version, _, payload = message.partition(" ")
+                version = int(version)
+                if overflowed.is_set() or version > seen + 1:
+                    overflowed.clear()
+                    while not inbox.empty():
+                        inbox.get_nowait()
+                    seen, event = state_event(version)
+                    yield event
+                elif version == seen + 1:
+                    seen = version
+                    yield f"event: diff\nid: {version}\ndata: {payload}\n\n"
+        finally:
+            self.broker.unsubscribe(key, receive)
+
+
+box_events = BoxEvents()
@@ -0,0 +1,318 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, AbacusOp, AbacusSnapshot
+from app.models.db import conflict_insert
+from . import STORAGE, Box
+from .transitions import transitions
+
+# Opcode and argument count of every loggable op. Arguments are zigzag
+# varints, so a typical op takes two to four bytes.
+OPS = {
+    "init": (1, 2),     # base, storage index
+    "add": (2, 2),      # y, k
+    "sub": (3, 2),      # y, k
+    "mul2": (4, 1),     # steps
+    "div2": (5, 1),     # steps
+    "convert": (6, 1),  # base
+    "set": (7, 0),      # box replaced wholesale; the state is in the snapshot
+    "undo": (8, 2),     # version restored, version undone
+    "redo": (9, 1),     # version restored
+}
+_NAMES = {code: (name, argc) for name, (code, argc) in OPS.items()}
+# Ops whose result can't be replayed from the previous state
+RESTORES = {"set", "undo", "redo"}
+SNAPSHOT_INTERVAL = 64
+# Versions are 32-bit integer columns
+MAX_VERSION = 2**31 - 1
+STORAGE_NAMES = list(STORAGE)
+
+
+def initial_box():
+    """The box every key starts from at version 0"""
+    return Box.init(base=5)
+
+
+def _write_unsigned(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_unsigned(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _write(out, n):
+    # Zigzag: 0, -1, 1, -2, ... -> 0, 1, 2, 3, ... so small negatives stay short
+    _write_unsigned(out, 2 * n if n >= 0 else -2 * n - 1)
+
+
+def _read(data, pos):
+    n, pos = _read_unsigned(data, pos)
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+
+
+def encode_ops(ops):
+    out = bytearray()
+    for name, *args in ops:
+        code, argc = OPS[name]
+        if name == "init":
+            args = [args[0], STORAGE_NAMES.index(args[1])]
+        out.append(code)
+        for arg in args[:argc]:
+            _write(out, arg)
+    return bytes(out)
+
+
+def decode_ops(data):
+    ops, pos = [], 0
+    while pos < len(data):
+        name, argc = _NAMES[data[pos]]
+        pos += 1
+        args = []
+        for _ in range(argc):
+            arg, pos = _read(data, pos)
+            args.append(arg)
+        if name == "init":
+            args[1] = STORAGE_NAMES[args[1]]
+        ops.append((name, *args))
+    return ops
+
+
+def encode_state(box):
+    """storage, W, P, row count, then (gap to previous row, count) pairs"""
+    storage = next(i for i, cls in enumerate(STORAGE.values()) if isinstance(box, cls))
+    out = bytearray([storage])
+    _write_unsigned(out, box.W)
+    _write_unsigned(out, box.P if box.P is not None else 0)
+    rows = sorted(box.rows.items())
+    _write_unsigned(out, len(rows))
+    previous = None
+    for y, c in rows:
+        if previous is None:
+            _write(out, y)
+        else:
+            _write_unsigned(out, y - previous)
+        _write_unsigned(out, c)
+        previous = y
+    return bytes(out)
+
+
+def decode_state(data):
+    cls = STORAGE[STORAGE_NAMES[data[0]]]
+    W, pos = _read_unsigned(data, 1)
+    P, pos = _read_unsigned(data, pos)
+    n, pos = _read_unsigned(data, pos)
+    rows, y = {}, None
+    for _ in range(n):
+        if y is None:
+            y, pos = _read(data, pos)
+        else:
+            gap, pos = _read_unsigned(data, pos)
+            y += gap
+        rows[y], pos = _read_unsigned(data, pos)
+    return cls(W=W, rows=rows, P=P)
+
+
+def needs_snapshot(version, ops):
+    return version % SNAPSHOT_INTERVAL == 0 or any(op[0] in RESTORES for op in ops)
+
+
+def apply_op(box, op):
+    """Apply one logged op tuple, e.g. ("add", 0, 2), and return the resulting box."""
+    name, *args = op
+    if name == "init":
+        return STORAGE[args[1]].init(base=args[0])
+    if name in ("add", "sub", "mul2", "div2"):
+        return transitions.apply(box, name, *args)
+    if name == "convert":
+        return transitions.apply(box, "convert_base", *args)
+    raise ValueError(f"{name} cannot be replayed")
+
+
+class MemoryHistoryStore:
+    """Process-local log with the same interface as DbHistoryStore, for tests."""
+
+    def __init__(self):
+        self._ops = {}
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def append_many(self, records):
+        now = datetime.utcnow()
+        lost = set()
+        with self._lock:
+            for key, version, ops, state in records:
+                log = self._ops.setdefault(key, {})
+                if key in lost or version in log:
+                    lost.add(key)
+                    continue
+                log[version] = (ops, now)
+                if state is not None:
+                    self._snapshots.setdefault(key, {})[version] = state
+        return lost
+
+    def snapshot_before(self, key, version):
+        versions = [v for v in self._snapshots.get(key, {}) if v <= version]
+        return (max(versions), self._snapshots[key][max(versions)]) if versions else None
+
+    def ops_between(self, key, after, upto):
+        log = self._ops.get(key, {})
+        return [(v, log[v][0], log[v][1]) for v in sorted(log) if after < v <= upto]
+
+
+class DbHistoryStore:
+    """Keeps the log in abacus_ops and snapshots in abacus_snapshots."""
+
+    def append_many(self, records):
+        """Log records in order and return the keys that lost a race.
+
+        Two workers racing on one key both log the version; the first wins,
+        and the loser's later records for that key are dropped with it.
+        """
+        ops, snapshots = AbacusOp.__table__, AbacusSnapshot.__table__
+        now = datetime.utcnow()
+        lost = set()
+        for key, version, blob, state in records:
+            if key in lost or not self._insert_op(ops, dict(key=key, version=version, ops=blob, created_at=now)):
+                lost.add(key)
+                continue
+            if state is not None:
+                db.session.execute(snapshots.insert().values(key=key, version=version, state=state))
+        db.session.commit()
+        return lost
+
+    @staticmethod
+    def _insert_op(table, values):
+        insert = conflict_insert(table)
+        if insert is not None:
+            return db.session.execute(insert.values(**values).on_conflict_do_nothing()).rowcount == 1
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**values))
+        except IntegrityError:
+            return False
+        return True
+
+    def snapshot_before(self, key, version):
+        table = AbacusSnapshot.__table__
+        row = db.session.execute(
+            select(table.c.version, table.c.state)
+            .where(table.c.key == key, table.c.version <= version)
+            .order_by(table.c.version.desc())
+            .limit(1)
+        ).first()
+        return (row.version, bytes(row.state)) if row else None
+
+    def ops_between(self, key, after, upto):
+        table = AbacusOp.__table__
+        rows = db.session.execute(
+            select(table.c.version, table.c.ops, table.c.created_at)
+            .where(table.c.key == key, table.c.version > after, table.c.version <= upto)
+            .order_by(table.c.version)
+        )
+        return [(row.version, bytes(row.ops), row.created_at) for row in rows]
+
+
+class History:
+    """Rebuilds old versions of a box and plans undo/redo.
+
+    Any version is rebuilt from the newest snapshot at or before it, by
+    replaying fewer than SNAPSHOT_INTERVAL logged ops; finding the snapshot
+    is one primary-key range lookup. Undo and redo never rewrite the log:
+    they append an op that restores an earlier version, and that version
+    always gets a snapshot, so replay never has to follow them.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or MemoryHistoryStore()
+
+    def init_app(self, app):
+        store = app.config.setdefault("ABACUS_STATE_STORE", "db")
+        self.store = MemoryHistoryStore() if store == "memory" else DbHistoryStore()
+
+    def rebuild(self, key, version):
+        """The box as of version, or None when the log doesn't reach back that far."""
+        snapshot = self.store.snapshot_before(key, version)
+        start, box = (snapshot[0], decode_state(snapshot[1])) if snapshot else (0, initial_box())
+        entries = self.store.ops_between(key, start, version)
+        if [v for v, _, _ in entries] != list(range(start + 1, version + 1)):
+            return None
+        for _, blob, _ in entries:
+            for op in decode_ops(blob):
+                box = apply_op(box, op)
+        return box
+
+    def catch_up(self, key, box, version):
+        """(box, version) brought up to the newest logged version after the given one"""
+        entries = self.store.ops_between(key, version, MAX_VERSION)
+        if not entries:
+            return box, version
+        latest = entries[-1][0]
+        rebuilt = self.rebuild(key, latest)
+        return (box, version) if rebuilt is None else (rebuilt, latest)
+
+    def log(self, key, after, limit):
+        """Up to limit (version, ops, created_at) entries after the given version"""
+        return [(v, decode_ops(blob), at) for v, blob, at in self.store.ops_between(key, after, after + limit)]
+
+    def _entry(self, key, version):
+        entries = self.store.ops_between(key, version - 1, version)
+        return decode_ops(entries[0][1]) if entries else None
+
+    def _effective(self, key, version):
+        """The last ordinary version whose state `version` holds"""
+        ops = self._entry(key, version) if version else None
+        if ops and len(ops) == 1 and ops[0][0] in ("undo", "redo"):
+            return ops[0][1]
+        return version
+
+    def undo(self, key, version):
+        """(op, box) that takes the box back one step from version"""
+        undone = self._effective(key, version)
+        if undone == 0:
+            raise ValueError("Nothing to undo")
+        target = self._effective(key, undone - 1)
+        box = self.rebuild(key, target)
+        if box is None:
+            raise ValueError("History does not reach back that far")
+        return ("undo", target, undone), box
+
+    def redo(self, key, version):
+        """(op, box) that reapplies the most recently undone step"""
+        # Walk back over the trailing run of undo/redo entries; each redo
+        # cancels the nearest undo before it
+        target, redone = None, 0
+        while target is None and version > 0:
+            ops = self._entry(key, version)
+            name = ops[0][0] if ops and len(ops) == 1 else None
+            if name == "undo" and not redone:
+                target = ops[0][2]
+            elif name == "undo":
+                redone -= 1
+            elif name == "redo":
+                redone += 1
+            else:
+                break
+            version -= 1
+        if target is None:
+            raise ValueError("Nothing to redo")
+        box = self.rebuild(key, target)
+        if box is None:
+            raise ValueError("History does not reach back that far")
+        return ("redo", target), box
+
+
+history = History()
@@ -0,0 +1,286 @@
+"""The number a box stands for, and fast conversion between bases.
+
+A box of width W counts in base W + 1: row y holding c beads is worth
+c * (W + 1) ** y, so rows are the digits of the value and negative rows are
+digits after the radix point. The divider does not change the value.
+
+CPython multiplies big ints with Karatsuba but divides and converts them to
+text with quadratic algorithms (and refuses int(str) past 4300 digits), so
+conversions here split numbers in half recursively over precomputed powers
+of the base and divide with Burnikel-Ziegler recursion. Converting an
+n-digit number costs O(n ** 1.58 * log n) instead of O(n ** 2).
+"""
+from fractions import Fraction
+from math import gcd
+
+from .box import Box
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_DIGIT_VALUES = {ch: i for i, ch in enumerate(DIGITS)}
+# Below these sizes CPython's own loops win
+_DIV_LIMIT = 4000
+_LEAF_DIGITS = 32
+
+
+def _div2n1n(a, b, n):
+    """(a // b, a % b) for an n-bit b and a < 2**n * b"""
+    if a.bit_length() - n <= _DIV_LIMIT:
+        return divmod(a, b)
+    pad = n & 1
+    if pad:
+        a <<= 1
+        b <<= 1
+        n += 1
+    half = n >> 1
+    mask = (1 << half) - 1
+    b1, b2 = b >> half, b & mask
+    q1, r = _div3n2n(a >> n, (a >> half) & mask, b, b1, b2, half)
+    q2, r = _div3n2n(r, a & mask, b, b1, b2, half)
+    if pad:
+        r >>= 1
+    return q1 << half | q2, r
+
+
+def _div3n2n(a12, a3, b, b1, b2, n):
+    if a12 >> n == b1:
+        q, r = (1 << n) - 1, a12 - (b1 << n) + b1
+    else:
+        q, r = _div2n1n(a12, b1, n)
+    r = (r << n | a3) - q * b2
+    while r < 0:
+        q -= 1
+        r += b
+    return q, r
+
+
+def fast_divmod(a, b):
+    """divmod for non-negative a and positive b, sub-quadratic when both are big"""
+    n = b.bit_length()
+    if n <= _DIV_LIMIT or a.bit_length() - n <= _DIV_LIMIT:
+        return divmod(a, b)
+    # Long division in base 2**n, each step a balanced recursive division
+    mask = (1 << n) - 1
+    q, r = 0, 0
+    for shift in range((a.bit_length() - 1) // n * n, -1, -n):
+        digit, r = _div2n1n((r << n) | ((a >> shift) & mask), b, n)
+        q = (q << n) | digit
+    return q, r
+
+
+def _powers(base, count):
+    """[base, base**2, base**4, ...] up to base**(2**count)"""
+    powers = [base]
+    for _ in range(count):
+        powers.append(powers[-1] * powers[-1])
+    return powers
+
+
+def to_digits(n, base):
+    """Digits of the non-negative int n in base, least significant first"""
+    if n < 0:
+        raise ValueError("value must not be negative")
+    if n == 0:
+        return []
+    k = 0
+    powers = [base]
+    while powers[-1] <= n:
+        powers.append(powers[-1] * powers[-1])
+        k += 1
+    # n < base**(2**k); every half below is padded to its full width
+
+    def inner(x, k, out):
+        if k <= 5:  # 2**5 == _LEAF_DIGITS
+            for _ in range(1 << k):
+                x, d = divmod(x, base)
+                out.append(d)
+            return
+        high, low = fast_divmod(x, powers[k - 1])
+        inner(low, k - 1, out)
+        inner(high, k - 1, out)
+
+    out = []
+    inner(n, k, out)
+    while out and not out[-1]:
+        out.pop()
+    return out
+
+
+def from_digits(digits, base):
+    """Int from digits in base, least significant first"""
+    if not digits:
+        return 0
+    k = max(len(digits) - 1, 1).bit_length()
+    powers = _powers(base, k)
+
+    def inner(lo, k):
+        # Combines digits[lo:lo + 2**k]
+        if k <= 5:
+            value = 0
+            for d in reversed(digits[lo:lo + (1 << k)]):
+                value = value * base + d
+            return value
+        mid = lo + (1 << (k - 1))
+        if mid >= len(digits):
+            return inner(lo, k - 1)
+        return inner(mid, k - 1) * powers[k - 1] + inner(lo, k - 1)
+
+    return inner(0, k)
+
+
+def _check_base(base):
+    if base < 2:
+        raise ValueError("base must be at least 2")
+
+
+def _parse(text, base):
+    """(digits, scale): the digits of text in base, least significant first,
+    scale of them after the radix point"""
+    _check_base(base)
+    if isinstance(text, list):
+        digits = list(reversed(text))
+        scale = 0
+    elif isinstance(text, str):
+        text = text.strip().lower()
+        whole, _, frac = text.partition(".")
+        if not whole + frac:
+            raise ValueError("value has no digits")
+        try:
+            digits = [_DIGIT_VALUES[ch] for ch in reversed(whole + frac)]
+        except KeyError as e:
+            raise ValueError(f"invalid digit {e.args[0]!r}")
+        scale = len(frac)
+    else:
+        raise ValueError("value must be a string or a list of digits")
+    if any(not isinstance(d, int) or not 0 <= d < base for d in digits):
+        raise ValueError(f"digits must be between 0 and {base - 1}")
+    return digits, scale
+
+
+def parse_value(text, base):
+    """Int or Fraction from text in base; digits are 0-9a-z, with an optional radix point.
+
+    A list of ints (most significant first) is also accepted, for bases
+    past 36.
+    """
+    digits, scale = _parse(text, base)
+    n = from_digits(digits, base)
+    return Fraction(n, base ** scale) if scale else n
+
+
+def _trim(digits, scale):
+    """Drop zeros past either end of the digits, as few after the radix point as possible"""
+    end = len(digits)
+    while end and not digits[end - 1]:
+        end -= 1
+    if not end:
+        return [], 0
+    zeros = 0
+    while zeros < scale and not digits[zeros]:
+        zeros += 1
+    return digits[zeros:end], scale - zeros
+
+
+def _convert(digits, scale, from_base, base):
+    """_trim of the digits of a parsed value, in base"""
+    if from_base == base:
+        return _trim(digits, scale)
+    return _expand(from_digits(digits, from_base), from_base, scale, base)
+
+
+def _expand(n, from_base, scale, base):
+    """Digits of n / from_base**scale in base, least significant first, and
+    how many of them follow the radix point (as few as possible).
+
+    No big gcd is taken: the part of from_base coprime to base must divide
+    n outright, and the rest divides base**e for some e found over small
+    numbers, so one exact division rescales n.
+    """
+    if scale and from_base != base:
+        coprime, shared = from_base, 1
+        g = gcd(coprime, base)
+        while g > 1:
+            coprime //= g
+            shared *= g
+            g = gcd(coprime, base)
+        if coprime > 1:
+            n, rest = fast_divmod(n, coprime ** scale)
+            if rest:
+                raise ValueError(f"value has no finite expansion in base {base}")
+        if shared == 1:
+            scale = 0
+        else:
+            e = 1
+            while fast_divmod(base ** e, shared)[1]:
+                e *= 2
+            n = fast_divmod(n * base ** (e * scale), shared ** scale)[0]
+            scale *= e
+    return _trim(to_digits(n, base), scale)
+
+
+def _format(digits, k, base):
+    digits = digits + [0] * (k + 1 - len(digits))
+    whole, frac = digits[k:][::-1], digits[:k][::-1]
+    if base > len(DIGITS):
+        if frac:
+            raise ValueError(f"fractions in base {base} have no text form")
+        return whole
+    text = "".join(DIGITS[d] for d in whole)
+    return f"{text}.{''.join(DIGITS[d] for d in frac)}" if frac else text
+
+
+def format_value(value, base):
+    """Text for value in base (the inverse of parse_value); lists of digits past base 36"""
+    _check_base(base)
+    value = Fraction(value)
+    if value < 0:
+        raise ValueError("value must not be negative")
+    return _format(*_expand(value.numerator, value.denominator, 1, base), base)
+
+
+def format_box(box):
+    """format_value(box_value(box), base) straight from the rows, which are the digits"""
+    base = box.W + 1
+    rows = box.rows
+    if not rows:
+        return _format([], 0, base)
+    low, high = min(min(rows), 0), max(rows)
+    return _format([rows.get(y, 0) for y in range(low, high + 1)], -low, base)
+
+
+def box_value(box):
+    """Int (or Fraction, with rows below 0) that box represents"""
+    rows = box.rows
+    if not rows:
+        return 0
+    base = box.W + 1
+    low, high = min(rows), max(rows)
+    value = from_digits([rows.get(y, 0) for y in range(low, high + 1)], base)
+    if low >= 0:
+        return value * base ** low
+    return Fraction(value, base ** -low)
+
+
+def _box(digits, k, base, storage):
+    rows = {y - k: d for y, d in enumerate(digits) if d}
+    return storage(W=base - 1, rows=rows, P=base - 1)
+
+
+def box_from_value(value, base, storage=Box):
+    """A box of the given base holding value, one row per non-zero digit"""
+    _check_base(base)
+    value = Fraction(value)
+    if value < 0:
+        raise ValueError("value must not be negative")
+    return _box(*_expand(value.numerator, value.denominator, 1, base), base, storage)
+
+
+def box_from_text(text, value_base, base, storage=Box):
+    """box_from_value(parse_value(text, value_base), base, storage), without reducing a Fraction"""
+    _check_base(base)
+    return _box(*_convert(*_parse(text, value_base), value_base, base), base, storage)
+
+
+def convert_value(value, from_base, to_base):
+    """Re-express text (or a digit list) in from_base as text in to_base"""
+    _check_base(to_base)
+    return _format(*_convert(*_parse(value, from_base), from_base, to_base), to_base)
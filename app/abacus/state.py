@@ -0,0 +1,248 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, AbacusState
+from app.models.db import conflict_insert
+from . import STORAGE
+from .history import encode_ops, encode_state, history, initial_box, needs_snapshot
+
+
+def box_to_state(box):
+    storage = next(name for name, cls in STORAGE.items() if isinstance(box, cls))
+    return {"storage": storage, **box.to_json()}
+
+
+def box_from_state(state):
+    cls = STORAGE[state.get("storage", "dict")]
+    rows = {y: c for y, c in state["rows"]}
+    try:
+        return cls(W=state["width"], rows=rows, P=state["divider"])
+    except ValueError:
+        # Array boxes saved before their width and span caps
+        return STORAGE["dict"](W=state["width"], rows=rows, P=state["divider"])
+
+
+class MemoryStateStore:
+    """Process-local store with the same interface as DbStateStore, for tests."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        return self._states.get(key)
+
+    def save_many(self, entries):
+        with self._lock:
+            for key, version, state in entries:
+                stored = self._states.get(key)
+                if stored is None or stored[0] < version:
+                    self._states[key] = (version, state)
+
+
+class DbStateStore:
+    """Keeps box states in the abacus_states table."""
+
+    def load(self, key):
+        table = AbacusState.__table__
+        row = db.session.execute(
+            select(table.c.version, table.c.state).where(table.c.key == key)
+        ).first()
+        return (row.version, json.loads(row.state)) if row else None
+
+    def save_many(self, entries):
+        """Write each state unless the stored version is as new or newer.
+
+        The check and the write are one statement, so of two workers saving
+        the same version only the first lands.
+        """
+        table = AbacusState.__table__
+        now = datetime.utcnow()
+        for key, version, state in entries:
+            values = dict(version=version, state=json.dumps(state, separators=(',', ':')), updated_at=now)
+            insert = conflict_insert(table)
+            if insert is not None:
+                insert = insert.values(key=key, **values)
+                db.session.execute(insert.on_conflict_do_update(
+                    index_elements=[table.c.key], set_=values, where=table.c.version < insert.excluded.version,
+                ))
+                continue
+            newer = table.update().where(table.c.key == key, table.c.version < version).values(**values)
+            if db.session.execute(newer).rowcount:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(table.insert().values(key=key, **values))
+            except IntegrityError:
+                # Inserted by another worker in between
+                db.session.execute(newer)
+        db.session.commit()
+
+
+class VersionConflict(Exception):
+    """Another worker published this version of the box first."""
+
+    def __init__(self, key, version):
+        super().__init__(f"Version {version} of {key} was already published")
+        self.key = key
+        self.version = version
+
+
+class _Entry:
+    __slots__ = ("box", "version", "dirty", "touched", "logged")
+
+    def __init__(self, box, version, dirty=False, logged=False):
+        self.box = box
+        self.version = version
+        self.dirty = dirty
+        self.touched = time.monotonic()
+        # Whether every version up to this one has been logged by this
+        # process (false for loaded boxes)
+        self.logged = logged
+
+
+class BoxCache:
+    """LRU of boxes keyed by owner, with idle eviction and write-behind.
+
+    Mutations only mark the cached entry dirty; dirty entries are written to
+    the store once per request, after the view has run. Callers pass the
+    version their client last saw (kept in the signed session cookie), and
+    an entry older than that is reloaded, so a client moving between workers
+    still reads its own writes while cache hits never touch the store.
+
+    Cached boxes are never mutated once published: writers take the key's
+    lock, work on a copy and `put` the result, so readers only ever hold the
+    short cache lock and never wait behind a long mul2/div2.
+
+    Each `put` writes its record to the operation log (see History) before
+    returning. The log's primary key makes that insert the compare-and-set
+    between workers: the one that loses gets VersionConflict, while its
+    caller can still tell the client. The log is also what a reload trusts
+    when the stored state lags behind it.
+    """
+
+    # Writers for different keys contend only when they share a stripe
+    LOCK_STRIPES = 64
+
+    def __init__(self, store=None, max_size=1024, idle_timeout=1800, history=history):
+        self.store = store or MemoryStateStore()
+        self.history = history
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()
+        self._evicted = []
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.setdefault("ABACUS_CACHE_SIZE", self.max_size)
+        self.idle_timeout = app.config.setdefault("ABACUS_IDLE_TIMEOUT", self.idle_timeout)
+        store = app.config.setdefault("ABACUS_STATE_STORE", "db")
+        self.store = MemoryStateStore() if store == "memory" else DbStateStore()
+
+        @app.after_request
+        def flush_abacus_states(response):
+            self.flush()
+            return response
+
+    def _evict(self, now):
+        stale = [key for key, e in self._entries.items() if now - e.touched > self.idle_timeout]
+        for key in stale:
+            self._drop(key)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self.evictions += 1
+        if entry.dirty:
+            self._evicted.append((key, entry.version, box_to_state(entry.box)))
+
+    def get(self, key, min_version=0):
+        """Return (box, version) for key, loading it from the store if needed."""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is not None and entry.version >= min_version:
+                entry.touched = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.box, entry.version
+            self.misses += 1
+
+        loaded = self.store.load(key)
+        if loaded is None:
+            version, box = 0, initial_box()
+        else:
+            version, box = loaded[0], box_from_state(loaded[1])
+        # The winner of a version saves its state only after its request
+        box, version = self.history.catch_up(key, box, version)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version >= version:
+                return entry.box, entry.version
+            self._entries[key] = _Entry(box, version)
+            self._evict(now)
+        return box, version
+
+    @contextmanager
+    def locked(self, key):
+        """Serialize writers of one key; readers are not affected."""
+        with self._key_locks[hash(key) % self.LOCK_STRIPES]:
+            yield
+
+    def put(self, key, box, version, ops=()):
+        """Publish box as the given version, produced from the previous one by ops.
+
+        Callers hold `locked(key)`. The version is snapshotted when the
+        previous one may be missing from the log, e.g. after a reload.
+        """
+        with self._lock:
+            previous = self._entries.get(key)
+            logged = previous is not None and previous.logged
+        snapshot = encode_state(box) if not logged or needs_snapshot(version, ops) else None
+        if self.history.store.append_many([(key, version, encode_ops(ops), snapshot)]):
+            # Reload the winner's box on the next read instead of serving ours
+            with self._lock:
+                self._entries.pop(key, None)
+            raise VersionConflict(key, version)
+        with self._lock:
+            self._entries[key] = _Entry(box, version, dirty=True, logged=True)
+            self._entries.move_to_end(key)
+            self._evict(time.monotonic())
+
+    def flush(self):
+        with self._lock:
+            pending, self._evicted = self._evicted, []
+            dirty = [(key, e) for key, e in self._entries.items() if e.dirty]
+            pending += [(key, e.version, box_to_state(e.box)) for key, e in dirty]
+        if not pending:
+            return
+        self.store.save_many(pending)
+        with self._lock:
+            for key, e in dirty:
+                if self._entries.get(key) is e:
+                    e.dirty = False
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+box_states = BoxCache()
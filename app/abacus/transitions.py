@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+
+class TransitionCache:
+    """LRU of (state, op, args) -> next state for small boxes.
+
+    States are the hashable `Box.canonical()` form, so dict- and
+    array-backed boxes share entries. Boxes with more than `max_rows`
+    occupied rows bypass the cache to keep every entry small.
+    """
+
+    def __init__(self, max_size=4096, max_rows=64):
+        self.max_size = max_size
+        self.max_rows = max_rows
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.setdefault("ABACUS_TRANSITION_CACHE_SIZE", self.max_size)
+        self.max_rows = app.config.setdefault("ABACUS_TRANSITION_MAX_ROWS", self.max_rows)
+
+    def apply(self, box, op, *args):
+        """Apply box.<op>(*args) and return the resulting box.
+
+        On a hit the result is a new box of the same type; on a miss box is
+        mutated in place and returned.
+        """
+        if box.occupied() > self.max_rows or not self.max_size:
+            getattr(box, op)(*args)
+            return box
+
+        key = (box.canonical(), op, args)
+        with self._lock:
+            state = self._entries.get(key)
+            if state is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if state is not None:
+            W, P, rows = state
+            return type(box)(W=W, rows=dict(rows), P=P)
+
+        getattr(box, op)(*args)
+        with self._lock:
+            self._entries[key] = box.canonical()
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return box
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+transitions = TransitionCache()
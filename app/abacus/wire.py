@@ -0,0 +1,130 @@
+"""Negotiated encodings of box state for the abacus endpoints.
+
+`application/json` (the default) keeps the original {"width", "divider",
+"rows": [[y, c], ...]} body. The compact forms add the version and replace
+the row list with run-length encoded counts starting at the lowest row:
+
+    {"version": 7, "width": 9, "divider": 9, "low": -2, "runs": [3, 2, 0, 5, 9, 1]}
+
+holds 3 beads in rows -2 and -1, nothing in rows 0 to 4 and 9 beads in row 5.
+`application/vnd.abacus.compact+json` sends that as JSON and
+`application/msgpack` (when the msgpack package is installed) as MessagePack.
+`application/vnd.abacus.state` is the varint form the history log snapshots
+with (see history.encode_state).
+
+Published boxes never change, so each encoding is built once per version
+and served from an LRU afterwards.
+"""
+import json
+import threading
+from collections import OrderedDict
+
+from .history import encode_state
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+COMPACT = "application/vnd.abacus.compact+json"
+MSGPACK = "application/msgpack"
+BINARY = "application/vnd.abacus.state"
+
+
+def offered():
+    """Media types the endpoints can answer with, preferred first"""
+    types = [JSON, COMPACT, BINARY]
+    if msgpack is not None:
+        types.insert(2, MSGPACK)
+    return types
+
+
+def compact(box, version):
+    low, runs = box.to_runs()
+    return {"version": version, "width": box.W, "divider": box.P, "low": low, "runs": runs}
+
+
+def from_runs(low, runs):
+    """Rows dict from a (low, runs) pair, the inverse of Box.to_runs"""
+    rows, y = {}, low
+    for i in range(0, len(runs), 2):
+        c, length = runs[i], runs[i + 1]
+        if c:
+            for row in range(y, y + length):
+                rows[row] = c
+        y += length
+    return rows
+
+
+def _dumps(body):
+    return json.dumps(body, separators=(",", ":")).encode()
+
+
+def encode(body, mimetype):
+    """Bytes of a compact or delta body in one of the offered media types"""
+    if mimetype == MSGPACK:
+        return msgpack.packb(body)
+    return _dumps(body)
+
+
+def encode_box(box, version, mimetype):
+    if mimetype == JSON:
+        return _dumps(box.to_json())
+    if mimetype == BINARY:
+        return encode_state(box)
+    return encode(compact(box, version), mimetype)
+
+
+class WireCache:
+    """LRU of encoded box states keyed by (owner, version, media type, since).
+
+    Entries remember the box they were built from and only answer for that
+    same object, so a version rebuilt differently (say, by another worker
+    that lost a race for it) is never served stale bytes.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.setdefault("ABACUS_WIRE_CACHE_SIZE", self.max_size)
+
+    def get(self, key, box, version, mimetype, since=None, build=None):
+        """Encoded bytes for box at version (or its delta since a version).
+
+        build() makes them on a miss; by default the full state is encoded.
+        """
+        cache_key = (key, version, mimetype, since)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and entry[0] is box:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        data = build() if build is not None else encode_box(box, version, mimetype)
+        if self.max_size:
+            with self._lock:
+                self._entries[cache_key] = (box, data)
+                self._entries.move_to_end(cache_key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return data
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+wire_cache = WireCache()
@@ -2,5 +2,6 @@ from .abacus_routes import abacus_routes
 from .auth_routes import auth_routes
 from .project_routes import project_routes
 from .user_routes import user_routes
+from .upload_routes import upload_routes
 
-__all__ = ["abacus_routes", "auth_routes", "project_routes", "user_routes"]
+__all__ = ["abacus_routes", "auth_routes", "project_routes", "user_routes", "upload_routes"]
@@ -1,137 +1,420 @@
-
-from flask import Blueprint, request, jsonify
-from dataclasses import dataclass, field
+import math
+import secrets
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context
+from flask_login import current_user, login_required
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from app.abacus import (
+    STORAGE, VersionConflict, box_events, box_from_text, box_states, convert_value, format_box, history, transitions,
+    wire_cache,
+)
+from app.abacus.events import box_diff
+from app.abacus.history import apply_op
+from app.abacus.wire import BINARY, JSON, encode, encode_box, offered
 
 abacus_routes = Blueprint('abacus', __name__, url_prefix='/api/abacus')
 
-@dataclass
-class Box:
-    W: int
-    rows: dict = field(default_factory=dict)  # y -> count
-    P: int = None
-
-    @classmethod
-    def init(cls, base: int):
-        assert base >= 2
-        W = base - 1
-        return cls(W=W, rows={}, P=W)
-
-    def _compact(self):
-        for y in list(self.rows):
-            if self.rows[y] <= 0:
-                del self.rows[y]
-
-    def _reset_divider(self):
-        self.P = self.W
-
-    def add(self, y: int, k: int):
-        self._reset_divider()
-        c = self.rows.get(y, 0)
-        self.rows[y] = min(self.W, c + max(0, k))
-        self._compact()
-
-    def sub(self, y: int, k: int):
-        self._reset_divider()
-        c = self.rows.get(y, 0)
-        self.rows[y] = max(0, c - max(0, k))
-        self._compact()
-
-    def _all_full(self):
-        nonblank = [c for c in self.rows.values() if c > 0]
-        return len(nonblank) > 0 and all(c == self.W for c in nonblank)
-
-    def mul2(self, steps: int):
-        steps = max(0, steps)
-        for _ in range(steps):
-            self._reset_divider()
-            if self._all_full():
-                self.rows = {y+1: c for y, c in self.rows.items() if c > 0}
-            else:
-                for y in list(self.rows):
-                    c = self.rows[y]
-                    if c > 0:
-                        self.rows[y] = min(self.W, 2*c)
-            self._compact()
-
-    def _all_single_or_blank(self):
-        nonblank = [c for c in self.rows.values() if c > 0]
-        return len(nonblank) > 0 and all(c <= 1 for c in nonblank)
-
-    def div2(self, steps: int):
-        steps = max(0, steps)
-        for _ in range(steps):
-            if not self.rows:
-                self._reset_divider()
-                return
-            if any(c >= 2 for c in self.rows.values()):
-                self.P = max(1, (self.P if self.P is not None else self.W) // 2)
-                for y in list(self.rows):
-                    self.rows[y] = min(self.rows[y], self.P)
-                self._compact()
-            else:
-                low = min(self.rows) if self.rows else 0
-                if low == 0:
-                    break
-                self.rows = {y-1: c for y, c in self.rows.items() if c > 0}
-                self._compact()
-
-    def convert_base(self, base: int):
-        assert base >= 2
-        Wp = base - 1
-        for y in list(self.rows):
-            self.rows[y] = min(self.rows[y], Wp)
-        self.W = Wp
-        self.P = self.W
-        self._compact()
-
-    def to_json(self):
-        return {
-            "width": self.W,
-            "divider": self.P,
-            "rows": sorted([[int(y), int(c)] for y, c in self.rows.items()], key=lambda t: t[0])
-        }
-
-# Simple in-memory demo state (per-process)
-BOX = Box.init(base=5)
+# Upper bound on the number of operations accepted by one /run request
+MAX_RUN_OPS = 10000
+# Every step of a /run with snapshots copies the whole box into the response
+MAX_SNAPSHOT_OPS = 1000
+MAX_SNAPSHOT_ROWS = 100_000
+# Bounds on one /values/convert request
+MAX_BATCH_VALUES = 1000
+MAX_BATCH_DIGITS = 1_000_000
+# Digits a single box value may be written with, /value either way
+MAX_VALUE_DIGITS = 1_000_000
+MAX_HISTORY_PAGE = 500
+
+# Request field names of each op's arguments, in op tuple order
+OP_FIELDS = {
+    'init': ('base', 'storage'),
+    'add': ('y', 'k'),
+    'sub': ('y', 'k'),
+    'mul2': ('steps',),
+    'div2': ('steps',),
+    'convert': ('base',),
+    'set': (),
+    'undo': ('restored', 'undone'),
+    'redo': ('restored',),
+}
+
+
+class OperationError(ValueError):
+    pass
+
+
+@abacus_routes.errorhandler(OperationError)
+def operation_error(e):
+    return {"errors": {"ops": str(e)}}, 400
+
+
+@abacus_routes.errorhandler(VersionConflict)
+def version_conflict(e):
+    return {"errors": {"version": "The box was changed elsewhere; reload it and try again"}}, 409
+
+
+def parse_op(step):
+    """Turn one operation dict into the op tuple that is applied and logged.
+
+    Missing arguments take the same defaults as the single-op endpoints.
+    """
+    op = step.get('op')
+    if op == 'init':
+        storage = step.get('storage', 'dict')
+        if storage not in STORAGE:
+            raise ValueError(f"storage must be one of: {', '.join(STORAGE)}")
+        return ('init', int(step.get('base', 5)), storage)
+    if op in ('add', 'sub'):
+        return (op, int(step.get('y', 0)), int(step.get('k', 1)))
+    if op in ('mul2', 'div2'):
+        return (op, int(step.get('steps', 1)))
+    if op == 'convert':
+        return ('convert', int(step.get('base', 5)))
+    raise ValueError(f"unknown op {op!r}")
+
+
+def op_to_json(op):
+    name, *args = op
+    return {'op': name, **dict(zip(OP_FIELDS[name], args))}
+
+
+def state_key():
+    """Boxes belong to the logged-in user, or to the browser session otherwise."""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    if 'abacus_id' not in session:
+        session['abacus_id'] = secrets.token_hex(16)
+    return f"session:{session['abacus_id']}"
+
+
+def load_box(key):
+    seen_key, seen_version = session.get('abacus_version', (None, 0))
+    return box_states.get(key, seen_version if seen_key == key else 0)
+
+
+def publish(program):
+    """Publish the next version of the caller's box and return (box, version).
+
+    program(box, key, version) runs under the key's lock and returns the new
+    box and the op tuples that produced it, which go to the history log. It
+    must not modify box: published boxes are never touched again, so
+    concurrent readers see either the old state or the new one, never a
+    half-applied op. Raises VersionConflict, answered with a 409, when
+    another worker published the same version first.
+    """
+    key = state_key()
+    with box_states.locked(key):
+        old, version = load_box(key)
+        box, ops = program(old, key, version)
+        box_states.put(key, box, version + 1, ops)
+        box_events.publish(key, version + 1, old, box)
+    session['abacus_version'] = (key, version + 1)
+    return box, version + 1
+
+
+def mutate_box(steps, on_step=None):
+    """Apply operation dicts in order to a copy of the caller's box and publish it.
+
+    Returns (box, version). Raises OperationError naming the first step
+    that fails, in which case nothing is published. on_step is called with
+    the box after each step.
+    """
+    def program(box, key, version):
+        box, ops = box.copy(), []
+        for i, step in enumerate(steps):
+            try:
+                if not isinstance(step, dict):
+                    raise ValueError("operation must be an object")
+                op = parse_op(step)
+                box = apply_op(box, op)
+            except (ValueError, TypeError, AssertionError) as e:
+                raise OperationError(f"Operation {i}: {str(e) or 'invalid arguments'}") from e
+            ops.append(op)
+            if on_step is not None:
+                on_step(box)
+        return box, ops
+
+    return publish(program)
+
+
+def box_response(box, version, key=None):
+    """The box in the media type the Accept header prefers (see app.abacus.wire).
+
+    With ?since=<version> the JSON and MessagePack forms carry only the rows
+    that changed since then, as {"version", "since", "rows": [[y, c], ...]}
+    plus width and divider when those changed; 0 means the row emptied.
+    The full state is sent instead when the log can't reach back that far.
+    Pass key to serve published boxes from the wire cache.
+    """
+    mimetype = request.accept_mimetypes.best_match(offered(), default=JSON)
+    since = request.args.get('since', type=int)
+    data = None
+    if key is not None and mimetype != BINARY and since is not None and 0 <= since <= version:
+        def delta():
+            old = history.rebuild(key, since)
+            return encode({"version": version, "since": since, **box_diff(old, box)}, mimetype) if old is not None else None
+        data = wire_cache.get(key, box, version, mimetype, since, delta)
+    if data is None:
+        data = wire_cache.get(key, box, version, mimetype) if key is not None else encode_box(box, version, mimetype)
+    return Response(data, mimetype=mimetype, headers={'X-Abacus-Version': str(version), 'Vary': 'Accept'})
+
 
 @abacus_routes.get('/state')
 def get_state():
-    return jsonify(BOX.to_json())
+    """The current box, or with ?version=N the box as it was at version N"""
+    key = state_key()
+    box, current = load_box(key)
+    version = request.args.get('version', type=int)
+    if version is None or version == current:
+        response = box_response(box, current, key)
+        # Lets the page know it can subscribe to /stream instead of refetching
+        if current_app.config.get('ABACUS_STREAMING'):
+            response.headers['X-Abacus-Streaming'] = '1'
+        return response
+    if not 0 <= version < current:
+        return {"errors": {"version": f"Version must be between 0 and {current}"}}, 404
+    box = history.rebuild(key, version)
+    if box is None:
+        return {"errors": {"version": "History does not reach back to that version"}}, 404
+    return box_response(box, version)
+
+def event_stream(key):
+    # Each open stream holds a thread; sync workers would be pinned by one tab
+    if not current_app.config.get('ABACUS_STREAMING'):
+        return Response(status=204)
+    return Response(
+        stream_with_context(box_events.stream(key, request.headers.get('Last-Event-ID'))),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def share_tokens():
+    return URLSafeTimedSerializer(current_app.secret_key, salt='abacus-watch')
+
+@abacus_routes.get('/stream')
+def stream():
+    """Server-sent events for the caller's box: a `state` event, then one `diff` per change"""
+    return event_stream(state_key())
+
+@abacus_routes.post('/share')
+@login_required
+def share():
+    """A token that lets other logged-in users watch the caller's box, e.g. a class"""
+    token = share_tokens().dumps(current_user.id)
+    return {"token": token, "url": f"{abacus_routes.url_prefix}/users/{current_user.id}/stream?token={token}"}
+
+@abacus_routes.get('/users/<int:user_id>/stream')
+@login_required
+def watch(user_id):
+    """Read-only event stream of a user's box, for its owner or holders of a share token"""
+    if user_id != current_user.id:
+        try:
+            shared = share_tokens().loads(
+                request.args.get('token', ''), max_age=current_app.config['ABACUS_SHARE_TTL']
+            )
+        except BadSignature:
+            shared = None
+        if shared != user_id:
+            return {"errors": {"authorization": "You can only watch boxes shared with you"}}, 403
+    return event_stream(f"user:{user_id}")
+
+@abacus_routes.get('/history')
+def get_history():
+    """The operation log, oldest first: ?after=<version>&limit=<n>"""
+    key = state_key()
+    _, current = load_box(key)
+    after = max(0, request.args.get('after', 0, type=int))
+    limit = min(max(1, request.args.get('limit', 100, type=int)), MAX_HISTORY_PAGE)
+    entries = history.log(key, after, limit)
+    return jsonify({
+        "version": current,
+        "entries": [
+            {"version": v, "ops": [op_to_json(op) for op in ops], "created_at": at.isoformat()}
+            for v, ops, at in entries
+        ],
+        "next_after": after + limit if after + limit < current else None,
+    })
+
+def _restore(program):
+    """Publish an undo/redo; history errors become a 400"""
+    try:
+        box, version = publish(program)
+    except ValueError as e:
+        return {"errors": {"history": str(e)}}, 400
+    return box_response(box, version, state_key())
+
+@abacus_routes.post('/undo')
+def undo():
+    def program(box, key, version):
+        op, restored = history.undo(key, version)
+        return restored, [op]
+    return _restore(program)
+
+@abacus_routes.post('/redo')
+def redo():
+    def program(box, key, version):
+        op, restored = history.redo(key, version)
+        return restored, [op]
+    return _restore(program)
 
 @abacus_routes.post('/init')
 def init_box():
     data = request.get_json(force=True, silent=True) or {}
-    base = int(data.get('base', 5))
-    global BOX
-    BOX = Box.init(base=base)
-    return jsonify(BOX.to_json())
+    storage = data.get('storage', 'dict')
+    if not isinstance(storage, str) or storage not in STORAGE:
+        return {"errors": {"storage": f"Storage must be one of: {', '.join(STORAGE)}"}}, 400
+    # parse_op validates the base along with every other op argument
+    box, version = mutate_box([dict(data, op='init')])
+    return box_response(box, version, state_key())
 
 @abacus_routes.post('/add')
 def add():
     data = request.get_json(force=True, silent=True) or {}
-    BOX.add(int(data.get('y', 0)), int(data.get('k', 1)))
-    return jsonify(BOX.to_json())
+    box, version = mutate_box([dict(data, op='add')])
+    return box_response(box, version, state_key())
 
 @abacus_routes.post('/sub')
 def sub():
     data = request.get_json(force=True, silent=True) or {}
-    BOX.sub(int(data.get('y', 0)), int(data.get('k', 1)))
-    return jsonify(BOX.to_json())
+    box, version = mutate_box([dict(data, op='sub')])
+    return box_response(box, version, state_key())
 
 @abacus_routes.post('/mul2')
 def mul2():
     data = request.get_json(force=True, silent=True) or {}
-    BOX.mul2(int(data.get('steps', 1)))
-    return jsonify(BOX.to_json())
+    box, version = mutate_box([dict(data, op='mul2')])
+    return box_response(box, version, state_key())
 
 @abacus_routes.post('/div2')
 def div2():
     data = request.get_json(force=True, silent=True) or {}
-    BOX.div2(int(data.get('steps', 1)))
-    return jsonify(BOX.to_json())
+    box, version = mutate_box([dict(data, op='div2')])
+    return box_response(box, version, state_key())
 
 @abacus_routes.post('/convert')
 def convert():
     data = request.get_json(force=True, silent=True) or {}
-    BOX.convert_base(int(data.get('base', 5)))
-    return jsonify(BOX.to_json())
+    box, version = mutate_box([dict(data, op='convert')])
+    return box_response(box, version, state_key())
+
+@abacus_routes.post('/run')
+def run():
+    """Apply an ordered list of operations atomically.
+
+    Body: {"ops": [{"op": "add", "y": 0, "k": 2}, ...], "snapshots": false}.
+    The ops run against a copy of the box, which is published only if every
+    op succeeds. With snapshots, at most MAX_SNAPSHOT_OPS ops and
+    MAX_SNAPSHOT_ROWS rows over all the snapshots are sent.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    ops = data.get('ops')
+    if not isinstance(ops, list):
+        return {"errors": {"ops": "ops must be a list of operations"}}, 400
+    limit = MAX_SNAPSHOT_OPS if data.get('snapshots') else MAX_RUN_OPS
+    if len(ops) > limit:
+        return {"errors": {"ops": f"At most {limit} operations per request"}}, 400
+
+    snapshots = [] if data.get('snapshots') else None
+    rows = 0
+
+    def on_step(box):
+        nonlocal rows
+        snapshot = box.to_json()
+        rows += len(snapshot["rows"])
+        if rows > MAX_SNAPSHOT_ROWS:
+            raise OperationError(f"Snapshots may hold at most {MAX_SNAPSHOT_ROWS} rows in total")
+        snapshots.append(snapshot)
+
+    box, _ = mutate_box(ops, on_step if snapshots is not None else None)
+    result = {"state": box.to_json()}
+    if snapshots is not None:
+        result["snapshots"] = snapshots
+    return jsonify(result)
+
+
+def converted_digits(value, from_base, to_base):
+    """Upper bound on the digits value takes once written in to_base, to size the work up front"""
+    if not isinstance(value, (str, list)):
+        return 0
+    digits = len(value) * max(1.0, math.log(max(from_base, 2), max(to_base, 2)))
+    if isinstance(value, str):
+        # One fraction digit can take up to log2(from_base) digits in another base (1/2 = 0.5)
+        digits += len(value.partition('.')[2]) * max(from_base, 2).bit_length()
+    return digits
+
+@abacus_routes.get('/value')
+def get_value():
+    """The number the box represents, written in the box's own base"""
+    box, _ = load_box(state_key())
+    base = box.W + 1
+    rows = box.rows
+    # mul2 and div2 move rows arbitrarily far from the radix point
+    if rows and max(max(rows), 0) - min(min(rows), 0) + 1 > MAX_VALUE_DIGITS:
+        return {"errors": {"value": f"The box spans more than {MAX_VALUE_DIGITS} digits"}}, 400
+    return {"base": base, "value": format_box(box)}
+
+@abacus_routes.post('/value')
+def set_value():
+    """Replace the box with one holding a number.
+
+    Body: {"value": "ff.8", "value_base": 16, "base": 10, "storage": "dict"}.
+    value_base defaults to 10; base and storage default to the current box's.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    current, _ = load_box(state_key())
+    storage = STORAGE.get(data.get('storage')) if 'storage' in data else type(current)
+    if storage is None:
+        return {"errors": {"storage": f"Storage must be one of: {', '.join(STORAGE)}"}}, 400
+    try:
+        text, value_base, base = data.get('value', '0'), int(data.get('value_base', 10)), int(data.get('base', current.W + 1))
+        if converted_digits(text, value_base, base) > MAX_VALUE_DIGITS:
+            raise ValueError(f"At most {MAX_VALUE_DIGITS} digits per value")
+        new_box = box_from_text(text, value_base, base, storage)
+    except (ValueError, TypeError) as e:
+        return {"errors": {"value": str(e) or 'invalid value'}}, 400
+    box, version = publish(lambda box, key, version: (new_box, [('set',)]))
+    return box_response(box, version, state_key())
+
+@abacus_routes.post('/values/convert')
+def convert_values():
+    """Convert many numbers between bases in one call.
+
+    Body: {"values": ["255", "10.5"], "from_base": 10, "to_base": 16}.
+    Values are digit strings (0-9a-z, optional radix point) or, for bases
+    past 36, lists of digits most significant first. Results come back in
+    the same order; any invalid value fails the whole batch.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    values = data.get('values')
+    if not isinstance(values, list):
+        return {"errors": {"values": "values must be a list"}}, 400
+    if len(values) > MAX_BATCH_VALUES:
+        return {"errors": {"values": f"At most {MAX_BATCH_VALUES} values per request"}}, 400
+    try:
+        from_base, to_base = int(data.get('from_base', 10)), int(data.get('to_base', 10))
+    except (ValueError, TypeError):
+        return {"errors": {"base": "from_base and to_base must be integers"}}, 400
+    if sum(converted_digits(v, from_base, to_base) for v in values) > MAX_BATCH_DIGITS:
+        return {"errors": {"values": f"At most {MAX_BATCH_DIGITS} digits per request"}}, 400
+
+    results, errors = [], {}
+    for i, value in enumerate(values):
+        try:
+            if not isinstance(value, (str, list)):
+                raise ValueError("value must be a string or a list of digits")
+            results.append(convert_value(value, from_base, to_base))
+        except ValueError as e:
+            errors[str(i)] = str(e)
+    if errors:
+        return {"errors": {"values": errors}}, 400
+    return jsonify({"values": results})
+
+
+@abacus_routes.get('/stats')
+def stats():
+    """Cache counters for monitoring"""
+    return {
+        "transitions": transitions.stats(),
+        "states": box_states.stats(),
+        "wire": wire_cache.stats(),
+    }
@@ -36,6 +36,11 @@ def login():
     
     if not user.check_password(password):
         return {'errors': {'password': 'Password was incorrect.'}}, 401
+
+    # Upgrade hashes made with an older algorithm or cost while we have the password
+    if user.password_needs_rehash():
+        user.password = password
+        db.session.commit()
     
     login_user(user)
     return user.to_dict()
@@ -1,15 +1,117 @@
-from flask import Blueprint, request, jsonify
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_login import login_required, current_user
-from app.models import db, Project
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from app.cache import project_cache
+from app.models import db, read_replica, search_clause, Project, User
 
 project_routes = Blueprint("projects", __name__, url_prefix="/api/projects")
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+EXPORT_BATCH_SIZE = 1000
+
+# Only the columns the listing payload needs (see Project.listing_dict)
+LISTING_COLUMNS = (
+    Project.id,
+    Project.name,
+    Project.image_url,
+    Project.description,
+    Project.user_id,
+    Project.created_at,
+    Project.updated_at,
+    User.username.label("owner"),
+)
+
+
+# One column of a keyset ordering: the expression, the row attribute it is
+# read back from, its direction and how to parse it out of a cursor
+SortKey = namedtuple("SortKey", "column attr descending parse")
+
+NEWEST_FIRST = (
+    SortKey(Project.updated_at, "updated_at", True, datetime.fromisoformat),
+    SortKey(Project.id, "id", True, int),
+)
+
+
+class InvalidPage(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(order):
+            raise ValueError(cursor)
+        return [key.parse(v) for key, v in zip(order, values)]
+    except (ValueError, TypeError):
+        raise InvalidPage("Invalid cursor")
+
+
+def after_cursor(order, values):
+    """Rows that sort strictly after `values` under `order`"""
+    clauses = []
+    for i, key in enumerate(order):
+        past = key.column < values[i] if key.descending else key.column > values[i]
+        clauses.append(and_(*[k.column == v for k, v in zip(order[:i], values)], past))
+    return or_(*clauses)
+
+
+def project_or_404(project_id):
+    """Load one project together with its owner in a single SELECT"""
+    return Project.query.options(joinedload(Project.owner)).get_or_404(project_id)
+
+
+def listing_query():
+    return db.session.query(*LISTING_COLUMNS).select_from(Project).outerjoin(User, Project.user_id == User.id)
+
+
+def paginate(query, order=NEWEST_FIRST):
+    """Keyset-paginate a listing query, newest first on (updated_at, id) by default.
+
+    Reads `limit` and `cursor` from the query string; the response carries
+    `next_cursor`, which is null on the last page.
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidPage("limit must be an integer")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        query = query.filter(after_cursor(order, decode_cursor(cursor, order)))
+
+    query = query.order_by(*[k.column.desc() if k.descending else k.column.asc() for k in order])
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor([getattr(rows[limit - 1], k.attr) for k in order])
+    return {"projects": [Project.listing_dict(r) for r in rows[:limit]], "next_cursor": next_cursor}
+
+
+@project_routes.errorhandler(InvalidPage)
+def invalid_page(e):
+    return {"errors": {"pagination": str(e)}}, 400
+
 
 @project_routes.route("", methods=["GET"])
+@project_cache.cached
+@read_replica
 def index():
-    """Get all projects (public endpoint)"""
-    projects = Project.query.order_by(Project.updated_at.desc()).all()
-    return {"projects": [p.to_dict() for p in projects]}
+    """Get a page of projects, newest first (public endpoint)"""
+    return paginate(listing_query())
 
 
 @project_routes.route("", methods=["POST"])
@@ -35,13 +137,16 @@ def create():
     )
     db.session.add(project)
     db.session.commit()
+    project_cache.invalidate()
     return project.to_dict(), 201
 
 
 @project_routes.route("/<int:project_id>", methods=["GET"])
+@project_cache.cached
+@read_replica
 def show(project_id):
     """Get a specific project"""
-    project = Project.query.get_or_404(project_id)
+    project = project_or_404(project_id)
     return project.to_dict()
 
 
@@ -49,7 +154,7 @@ def show(project_id):
 @login_required
 def update(project_id: int):
     """Update a project (only owner can edit)"""
-    project = Project.query.get_or_404(project_id)
+    project = project_or_404(project_id)
     
     if project.user_id != current_user.id:
         return {"errors": {"authorization": "You can only edit your own projects"}}, 403
@@ -67,6 +172,7 @@ def update(project_id: int):
         project.description = description
     
     db.session.commit()
+    project_cache.invalidate()
     return project.to_dict()
 
 
@@ -81,23 +187,46 @@ def destroy(project_id: int):
     
     db.session.delete(project)
     db.session.commit()
+    project_cache.invalidate()
     return {"status": "ok"}
 
 
 @project_routes.route("/my-projects", methods=["GET"])
 @login_required
 def my_projects():
-    """Get current user's projects"""
-    projects = Project.query.filter_by(user_id=current_user.id).order_by(Project.updated_at.desc()).all()
-    return {"projects": [p.to_dict() for p in projects]}
+    """Get a page of the current user's projects"""
+    return paginate(listing_query().filter(Project.user_id == current_user.id))
+
+
+@project_routes.route("/export", methods=["GET"])
+@login_required
+def export():
+    """Stream every project as NDJSON; `flask projects import` reads it back"""
+    def generate():
+        rows = listing_query().order_by(Project.id).yield_per(EXPORT_BATCH_SIZE)
+        for row in rows:
+            yield json.dumps(Project.listing_dict(row), separators=(",", ":")) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=projects.ndjson"},
+    )
 
 
 @project_routes.route("/search", methods=["GET"])
+@project_cache.cached
+@read_replica
 def search():
-    """Search projects by name"""
+    """Search project names and descriptions, best matches first, a page at a time"""
     query = request.args.get("q", "").strip()
     if not query:
-        return {"projects": []}
-    
-    projects = Project.query.filter(Project.name.ilike(f"%{query}%")).order_by(Project.updated_at.desc()).all()
-    return {"projects": [p.to_dict() for p in projects]}
\ No newline at end of file
+        return {"projects": [], "next_cursor": None}
+
+    join, match, score = search_clause(query)
+    results = listing_query()
+    if join is not None:
+        results = results.join(*join)
+    results = results.filter(match).add_columns(score.label("score"))
+    order = (SortKey(score, "score", False, float), SortKey(Project.id, "id", True, int))
+    return paginate(results, order)
\ No newline at end of file
@@ -0,0 +1,24 @@
+from flask import Blueprint, request
+from flask_login import login_required
+from app.uploads import upload_store, thumbnail_url
+
+upload_routes = Blueprint('uploads', __name__, url_prefix='/api/uploads')
+
+
+@upload_routes.route('', methods=['POST'])
+@login_required
+def upload():
+    """
+    Stores an uploaded image (multipart field "file") and returns its URLs
+    """
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        return {'errors': {'file': 'An image file is required'}}, 400
+
+    try:
+        name = upload_store.save(file.stream, file.filename)
+    except ValueError as e:
+        return {'errors': {'file': str(e)}}, 400
+
+    url = f"/uploads/{name}"
+    return {'url': url, 'thumbnail_url': thumbnail_url(url)}, 201
@@ -0,0 +1,212 @@
+"""ASGI entry point for the API.
+
+    gunicorn app.asgi:app -k uvicorn.workers.UvicornWorker
+
+The event loop owns the client connections, so idle keep-alives, slow
+uploads and slow readers cost no thread. The Flask app itself stays
+synchronous: each request runs on a thread from a bounded pool
+(ASGI_THREADS). Requests for the abacus engine are CPU-bound and get their own
+small pool (ASGI_CPU_THREADS), so a burst of box operations cannot
+occupy the threads the project and auth endpoints wait on the database
+with. Password hashing runs on the request's thread, and pbkdf2 releases
+the GIL while it works.
+Server-sent event streams hold their thread for as long as the client
+watches, so they get a large pool of their own (ASGI_STREAM_THREADS).
+"""
+import asyncio
+import concurrent.futures
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from app import app as flask_app
+
+# Response chunks buffered per request before the app thread waits for the client
+SEND_QUEUE_SIZE = 8
+CPU_PREFIXES = ("/api/abacus",)
+STREAM_SUFFIXES = ("/stream",)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class AsgiAdapter:
+    """Runs a WSGI app behind ASGI on bounded thread pools."""
+
+    def __init__(self, wsgi_app, threads, cpu_threads, stream_threads,
+                 cpu_prefixes=CPU_PREFIXES, stream_suffixes=STREAM_SUFFIXES):
+        self.wsgi_app = wsgi_app
+        self.cpu_prefixes = cpu_prefixes
+        self.stream_suffixes = stream_suffixes
+        self.io_pool = ThreadPoolExecutor(threads, thread_name_prefix="asgi-io")
+        self.cpu_pool = ThreadPoolExecutor(cpu_threads, thread_name_prefix="asgi-cpu")
+        self.stream_pool = ThreadPoolExecutor(stream_threads, thread_name_prefix="asgi-stream")
+
+    def _pool(self, path):
+        if path.endswith(self.stream_suffixes):
+            return self.stream_pool
+        if path.startswith(self.cpu_prefixes):
+            return self.cpu_pool
+        return self.io_pool
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for pool in (self.io_pool, self.cpu_pool, self.stream_pool):
+                    pool.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = SpooledTemporaryFile(max_size=1024 * 1024)
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.write(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(SEND_QUEUE_SIZE)
+        stopped = threading.Event()
+        worker = loop.run_in_executor(self._pool(scope["path"]), self._run, build_environ(scope, body), loop, queue, stopped)
+
+        # uvicorn drops sends to a closed connection silently, so watch for the
+        # disconnect to stop long-running responses such as event streams
+        disconnected = asyncio.ensure_future(self._disconnect(receive))
+        try:
+            while True:
+                message = asyncio.ensure_future(queue.get())
+                await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not message.done():
+                    message.cancel()
+                    break
+                kind, value = message.result()
+                if kind == "error":
+                    raise value
+                if kind == "start":
+                    status, headers = value
+                    await send({"type": "http.response.start", "status": status, "headers": headers})
+                elif kind == "body":
+                    await send({"type": "http.response.body", "body": value, "more_body": True})
+                else:
+                    await send({"type": "http.response.body", "body": b""})
+                    break
+        finally:
+            stopped.set()
+            disconnected.cancel()
+            await worker
+            body.close()
+
+    async def _disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    def _run(self, environ, loop, queue, stopped):
+        def put(message):
+            if stopped.is_set():
+                raise ClientDisconnected()
+            future = asyncio.run_coroutine_threadsafe(queue.put(message), loop)
+            while True:
+                try:
+                    return future.result(timeout=1)
+                except concurrent.futures.TimeoutError:
+                    if stopped.is_set():
+                        future.cancel()
+                        raise ClientDisconnected()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["start"] = (
+                int(status.split(" ", 1)[0]),
+                [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers],
+            )
+
+        try:
+            result = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in result:
+                    if not response.get("sent"):
+                        put(("start", response["start"]))
+                        response["sent"] = True
+                    if chunk:
+                        put(("body", chunk))
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+            if not response.get("sent"):
+                put(("start", response["start"]))
+            put(("end", None))
+        except ClientDisconnected:
+            pass
+        except BaseException as e:
+            try:
+                put(("error", e))
+            except ClientDisconnected:
+                pass
+
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope (PEP 3333 strings are latin-1)"""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": scope["client"][0] if scope.get("client") else "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        # The whole body is spooled before the app runs, chunked or not
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            key = name
+        else:
+            key = f"HTTP_{name}"
+        if key in environ:
+            value = f"{environ[key]}{'; ' if key == 'HTTP_COOKIE' else ','}{value}"
+        environ[key] = value
+    return environ
+
+
+# The event loop holds idle streams, so /api/abacus/stream is safe to offer
+if "ABACUS_STREAMING" not in os.environ:
+    flask_app.config["ABACUS_STREAMING"] = True
+
+app = AsgiAdapter(
+    flask_app,
+    flask_app.config["ASGI_THREADS"],
+    flask_app.config["ASGI_CPU_THREADS"],
+    flask_app.config["ASGI_STREAM_THREADS"],
+)
@@ -0,0 +1,55 @@
+import json
+import platform
+import sys
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .harness import bench_batch, bench_engine, bench_http, compare
+
+# Creates a bench group to hold the benchmark commands
+# So we can type `flask bench --help`
+bench_commands = AppGroup('bench')
+
+
+# Creates the `flask bench run` command
+@bench_commands.command('run')
+@click.option('--only', type=click.Choice(['engine', 'batch', 'http']), help='Run a single suite.')
+@click.option('--repeat', default=200, show_default=True, help='Timed calls per case.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write results to this JSON file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='JSON results to compare against.')
+@click.option('--tolerance', default=0.2, show_default=True, help='Allowed ops/sec drop before flagging.')
+def run(only, repeat, output, baseline, tolerance):
+    results = {}
+    if only in (None, 'engine'):
+        results.update(bench_engine(repeat))
+    if only in (None, 'batch'):
+        results.update(bench_batch(repeat))
+    if only in (None, 'http'):
+        results.update(bench_http(current_app, repeat))
+
+    for name, r in results.items():
+        click.echo(f"{name:<70} {r['ops_per_sec']:>12.1f} ops/s  p50 {r['p50_us']:>9.2f}us  "
+                   f"p99 {r['p99_us']:>9.2f}us  peak {r['peak_kib']:>8.1f}KiB")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                "meta": {
+                    "python": sys.version.split()[0],
+                    "platform": platform.platform(),
+                    "recorded_at": datetime.utcnow().isoformat(),
+                    "repeat": repeat,
+                },
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f)["results"], tolerance)
+        for name, r in regressions.items():
+            click.echo(f"REGRESSION {name}: {r['baseline_ops_per_sec']} -> {r['ops_per_sec']} ops/s", err=True)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,141 @@
+import gc
+import random
+import time
+import tracemalloc
+
+from app.abacus import STORAGE, BoxBatch
+from app.abacus.history import MemoryHistoryStore, history
+from app.abacus.state import MemoryStateStore, box_states
+
+BASES = (2, 5, 10, 16)
+ROW_COUNTS = (1, 16, 256, 4096)
+STEP_COUNTS = (1, 64, 1_000_000)
+BATCH_SIZES = (1000, 10000)
+
+
+def measure(fn, setup=lambda: None, repeat=200):
+    """Time fn(setup()) `repeat` times; setup is excluded from the timings.
+
+    Peak memory comes from one extra tracemalloc-instrumented call, so the
+    tracing overhead does not leak into the latency figures.
+    """
+    timings = []
+    gc.collect()
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter_ns()
+        fn(arg)
+        timings.append(time.perf_counter_ns() - start)
+
+    arg = setup()
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    total = sum(timings) or 1
+    return {
+        "ops_per_sec": round(repeat * 1e9 / total, 1),
+        "p50_us": round(timings[len(timings) // 2] / 1e3, 2),
+        "p99_us": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1e3, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def make_box(storage, base, rows, seed=0):
+    rng = random.Random(seed)
+    box = STORAGE[storage].init(base=base)
+    for y in range(rows):
+        box.add(y, rng.randint(1, box.W))
+    return box
+
+
+def engine_cases():
+    for storage in STORAGE:
+        for base in BASES:
+            for rows in ROW_COUNTS:
+                yield storage, base, rows, "add", (rows // 2, 1)
+                yield storage, base, rows, "sub", (rows // 2, 1)
+                yield storage, base, rows, "convert_base", (max(2, base // 2),)
+                for steps in STEP_COUNTS:
+                    yield storage, base, rows, "mul2", (steps,)
+                    yield storage, base, rows, "div2", (steps,)
+
+
+def bench_engine(repeat=200):
+    results = {}
+    for storage, base, rows, op, args in engine_cases():
+        box = make_box(storage, base, rows)
+        name = f"engine/{storage}/base={base}/rows={rows}/{op}({','.join(map(str, args))})"
+        results[name] = measure(lambda b: getattr(b, op)(*args), box.copy, repeat)
+    return results
+
+
+def batch_cases():
+    for base in BASES:
+        for size in BATCH_SIZES:
+            yield base, size, "add", (8, 1)
+            yield base, size, "sub", (8, 1)
+            yield base, size, "convert_base", (max(2, base // 2),)
+            for steps in STEP_COUNTS:
+                yield base, size, "mul2", (steps,)
+                yield base, size, "div2", (steps,)
+
+
+def bench_batch(repeat=200):
+    """Engine ops on BoxBatches of distinct 16-row boxes; one call covers the whole batch"""
+    results, batches = {}, {}
+    for base, size, op, args in batch_cases():
+        if (base, size) not in batches:
+            batches[base, size] = BoxBatch.from_boxes(make_box("dict", base, 16, seed) for seed in range(size))
+        name = f"batch/base={base}/boxes={size}/{op}({','.join(map(str, args))})"
+        results[name] = measure(lambda b: getattr(b, op)(*args), batches[base, size].copy, repeat)
+    return results
+
+
+def http_cases():
+    yield "GET /state", "get", "/api/abacus/state", None
+    yield "POST /add", "post", "/api/abacus/add", {"y": 3, "k": 1}
+    yield "POST /mul2 steps=1000", "post", "/api/abacus/mul2", {"steps": 1000}
+    yield "POST /div2 steps=1000", "post", "/api/abacus/div2", {"steps": 1000}
+    yield "POST /run 100 ops", "post", "/api/abacus/run", {
+        "ops": [{"op": "add", "y": i % 8, "k": 1} for i in range(100)]
+    }
+
+
+def bench_http(app, repeat=200):
+    """Drive the abacus blueprint through the Flask test client.
+
+    State and the operation log are kept in memory stores for the duration
+    so the numbers measure the request path and engine rather than the
+    database.
+    """
+    store, box_states.store = box_states.store, MemoryStateStore()
+    log_store, history.store = history.store, MemoryHistoryStore()
+    try:
+        client = app.test_client()
+        client.post("/api/abacus/init", json={"base": 10})
+        results = {}
+        for name, method, url, body in http_cases():
+            call = getattr(client, method)
+            results[f"http/{name}"] = measure(lambda _: call(url, json=body), repeat=repeat)
+        return results
+    finally:
+        # Pending writes belong to the memory stores, not the real ones
+        box_states.flush()
+        box_states.store = store
+        history.store = log_store
+
+
+def compare(results, baseline, tolerance):
+    """Return the cases whose throughput fell more than `tolerance` below baseline."""
+    regressions = {}
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before and current["ops_per_sec"] < before["ops_per_sec"] * (1 - tolerance):
+            regressions[name] = {
+                "baseline_ops_per_sec": before["ops_per_sec"],
+                "ops_per_sec": current["ops_per_sec"],
+            }
+    return regressions
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, request
+
+
+class LocalCacheBackend:
+    """In-process LRU backend; also the stand-in for the shared one in tests.
+
+    Each worker has its own copy, so a write on one worker leaves the others
+    serving their entries until the TTL runs out. Use RESPONSE_CACHE_URL
+    when running more than one worker. Counters (the generations) are kept
+    apart from the entries so eviction never resets them.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                now = time.monotonic()
+                for stale in [k for k, (_, expires) in self._data.items() if expires is not None and expires < now]:
+                    del self._data[stale]
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+    def stamp(self, key):
+        """Store the current time under key, kept like a counter"""
+        with self._lock:
+            self._counters[key] = time.time()
+
+    def discard_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+
+class RedisCacheBackend:
+    """Shared backend so every worker sees the same entries and invalidations."""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL requires the redis package")
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(key, json.dumps(value), ex=ttl)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+    def stamp(self, key):
+        self._client.set(key, json.dumps(time.time()))
+
+    def discard_prefix(self, prefix):
+        # Orphaned generations expire on their own TTL
+        pass
+
+
+def _last_modified(payload):
+    """Newest updated_at in a project payload, or None"""
+    items = payload.get("projects", [payload]) if isinstance(payload, dict) else []
+    stamps = [p["updated_at"] for p in items if isinstance(p, dict) and p.get("updated_at")]
+    return datetime.fromisoformat(max(stamps)) if stamps else None
+
+
+class ResponseCache:
+    """Caches successful JSON responses of read endpoints by URL.
+
+    Entries are keyed under a generation number. `invalidate()` bumps it,
+    which orphans every entry at once; a local backend also drops them.
+    Cached responses carry a strong ETag (hash of the body) and
+    Last-Modified, and a matching conditional request is answered with 304
+    straight from the cache.
+
+    Responses read from a replica within DB_REPLICA_MAX_LAG of the last
+    invalidation are served but not stored, since the replica may not have
+    the write yet.
+    """
+
+    def __init__(self, namespace, ttl=300, max_size=1024):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_size = max_size
+        self.backend = LocalCacheBackend(max_size)
+
+    def init_app(self, app):
+        url = app.config.setdefault("RESPONSE_CACHE_URL", None)
+        self.ttl = app.config.setdefault("RESPONSE_CACHE_TTL", self.ttl)
+        self.max_size = app.config.setdefault("RESPONSE_CACHE_SIZE", self.max_size)
+        self.backend = RedisCacheBackend(url) if url else LocalCacheBackend(self.max_size)
+
+    def _key(self):
+        generation = self.backend.get(f"{self.namespace}:generation") or 0
+        return f"{self.namespace}:{generation}:{request.full_path}"
+
+    def invalidate(self):
+        generation = self.backend.incr(f"{self.namespace}:generation")
+        self.backend.stamp(f"{self.namespace}:invalidated_at")
+        self.backend.discard_prefix(f"{self.namespace}:{generation - 1}:")
+
+    def _replica_may_be_stale(self):
+        """Whether the view read from a replica that may predate the last invalidation"""
+        if not g.get("db_replica_reads"):
+            return False
+        invalidated_at = self.backend.get(f"{self.namespace}:invalidated_at") or 0
+        return time.time() - invalidated_at <= current_app.config.get("DB_REPLICA_MAX_LAG", 0)
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = self._key()
+            entry = self.backend.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or not response.is_json or self._replica_may_be_stale():
+                    return response
+                body = response.get_data(as_text=True)
+                last_modified = _last_modified(response.get_json())
+                entry = {
+                    "body": body,
+                    "etag": hashlib.sha256(body.encode()).hexdigest(),
+                    "last_modified": last_modified.isoformat() if last_modified else None,
+                }
+                self.backend.set(key, entry, self.ttl)
+
+            response = current_app.response_class(entry["body"], mimetype="application/json")
+            response.set_etag(entry["etag"])
+            if entry["last_modified"]:
+                response.last_modified = datetime.fromisoformat(entry["last_modified"])
+            response.cache_control.public = True
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+        return wrapper
+
+
+project_cache = ResponseCache("projects")
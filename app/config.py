@@ -1,19 +1,52 @@
 import os
 
+from app.models.db import REPLICA_BIND, TimedQueuePool
+
+
+def _database_url(name):
+    url = os.environ.get(name)
+    # Heroku/Render hand out postgres:// URLs, which SQLAlchemy 1.4 rejects
+    if url and url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-key")
     FLASK_ENV = os.environ.get("FLASK_ENV", "development")
 
-    
-    _db_url = os.environ.get("DATABASE_URL")
+    _db_url = _database_url("DATABASE_URL")
     if _db_url:
-      
-        if _db_url.startswith("postgres://"):
-            _db_url = _db_url.replace("postgres://", "postgresql://", 1)
         SQLALCHEMY_DATABASE_URI = _db_url
     else:
-      
         os.makedirs(os.path.join(os.path.dirname(__file__), "..", "instance"), exist_ok=True)
         SQLALCHEMY_DATABASE_URI = "sqlite:///../instance/dev.db"
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool sizing is per process: each gunicorn worker holds up to
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW connections to every configured database
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+    # Milliseconds any single statement of a request may run (Postgres only, 0 = none)
+    DB_STATEMENT_TIMEOUT = int(os.environ.get("DB_STATEMENT_TIMEOUT", 0))
+    # How long after a local write the public listings keep reading the primary
+    DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", 5))
+
+    SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # SQLite keeps SQLAlchemy's own pool; the sizing options only apply to servers
+    if not SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    # Public GET project endpoints read from here when it is set
+    _replica_url = _database_url("DATABASE_REPLICA_URL")
+    SQLALCHEMY_BINDS = {REPLICA_BIND: _replica_url} if _replica_url else {}
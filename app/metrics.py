@@ -0,0 +1,164 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in labels)
+
+
+class Instrumentation:
+    """Opt-in request, SQL and serialization metrics for this process.
+
+    Enabled with METRICS_ENABLED. Every request records its latency, the
+    number and total duration of SQL statements it ran (through SQLAlchemy
+    engine events), and the time spent in the to_dict/to_json serializers
+    wrapped with `timed`. Results are served in Prometheus text format at
+    /api/metrics. With PROFILE_SAMPLE_RATE > 0 a sample of requests runs
+    under cProfile, and those slower than SLOW_REQUEST_SECONDS are dumped
+    to PROFILE_DIR for `python -m pstats`.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._durations = defaultdict(_Histogram)
+        self._sql_queries = defaultdict(int)
+        self._sql_seconds = defaultdict(float)
+        self._serialization = defaultdict(float)
+        self._gauges = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault("METRICS_ENABLED", False)
+        if not self.enabled:
+            return
+        self.sample_rate = app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+        self.slow_seconds = app.config.setdefault("SLOW_REQUEST_SECONDS", 1.0)
+        self.profile_dir = app.config.setdefault("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+
+        event.listen(Engine, "before_cursor_execute", self._before_cursor)
+        event.listen(Engine, "after_cursor_execute", self._after_cursor)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule("/api/metrics", "metrics", self.render)
+
+    def gauge(self, name, source):
+        """Export the numeric items of source() as `<name>_<key>` gauges"""
+        self._gauges[name] = source
+
+    def _before_request(self):
+        g.metrics = {"start": time.perf_counter(), "sql_queries": 0, "sql_seconds": 0.0, "profiler": None}
+        if self.sample_rate and random.random() < self.sample_rate:
+            g.metrics["profiler"] = cProfile.Profile()
+            g.metrics["profiler"].enable()
+
+    def _after_request(self, response):
+        metrics = g.pop("metrics", None)
+        if metrics is None:
+            return response
+        elapsed = time.perf_counter() - metrics["start"]
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        key = (("method", request.method), ("endpoint", endpoint), ("status", response.status_code))
+        with self._lock:
+            self._durations[key].observe(elapsed)
+            self._sql_queries[key[:2]] += metrics["sql_queries"]
+            self._sql_seconds[key[:2]] += metrics["sql_seconds"]
+
+        profiler = metrics["profiler"]
+        if profiler is not None:
+            profiler.disable()
+            if elapsed >= self.slow_seconds:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                slug = re.sub(r"[^A-Za-z0-9]+", "_", endpoint).strip("_") or "root"
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{int(time.time() * 1000)}-{request.method}-{slug}.prof"))
+        return response
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "metrics" in g:
+            conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if started and has_request_context() and "metrics" in g:
+            g.metrics["sql_queries"] += 1
+            g.metrics["sql_seconds"] += time.perf_counter() - started.pop()
+
+    def record_serialization(self, kind, seconds):
+        with self._lock:
+            self._serialization[kind] += seconds
+
+    def render(self):
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by endpoint.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for key, h in sorted(self._durations.items()):
+                labels = _labels(key)
+                for bound, count in zip(BUCKETS, h.counts):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {h.total:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {h.count}")
+
+            lines += ["# HELP http_request_sql_queries_total SQL statements run by requests.",
+                      "# TYPE http_request_sql_queries_total counter"]
+            lines += [f"http_request_sql_queries_total{{{_labels(k)}}} {v}" for k, v in sorted(self._sql_queries.items())]
+            lines += ["# HELP http_request_sql_seconds_total Time spent in SQL statements by requests.",
+                      "# TYPE http_request_sql_seconds_total counter"]
+            lines += [f"http_request_sql_seconds_total{{{_labels(k)}}} {v:.6f}" for k, v in sorted(self._sql_seconds.items())]
+            lines += ["# HELP serialization_seconds_total Time spent in to_dict/to_json serializers.",
+                      "# TYPE serialization_seconds_total counter"]
+            lines += [f'serialization_seconds_total{{kind="{k}"}} {v:.6f}' for k, v in sorted(self._serialization.items())]
+
+        for name, source in sorted(self._gauges.items()):
+            for key, value in sorted(source().items()):
+                lines.append(f"# TYPE {name}_{key} gauge")
+                lines.append(f"{name}_{key} {value}")
+        return "\n".join(lines) + "\n", 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+
+instrumentation = Instrumentation()
+
+
+def timed(kind):
+    """Add the wrapped serializer's run time to serialization_seconds_total{kind}"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                instrumentation.record_serialization(kind, time.perf_counter() - start)
+        return wrapper
+    return decorator
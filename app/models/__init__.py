@@ -1,5 +1,12 @@
-from .db import db, environment, SCHEMA
+from .db import db, environment, pool_stats, read_replica, SCHEMA
 from .user import User
 from .project import Project
+from .abacus_state import AbacusState
+from .abacus_history import AbacusOp, AbacusSnapshot
+from .project_search import search_clause
+from .user_identity import UserIdentity, user_identities
 
-__all__ = ["db", "User", "Project", "environment", "SCHEMA"]
+__all__ = [
+    "db", "User", "Project", "AbacusState", "AbacusOp", "AbacusSnapshot", "UserIdentity", "user_identities",
+    "environment", "pool_stats", "read_replica", "search_clause", "SCHEMA",
+]
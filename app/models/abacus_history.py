@@ -0,0 +1,31 @@
+from datetime import datetime
+from .db import db, environment, SCHEMA
+
+
+class AbacusOp(db.Model):
+    """One entry of a box's append-only operation log.
+
+    Every mutation of a box bumps its version by one and stores the ops it
+    applied here, binary-encoded (see app.abacus.history).
+    """
+    __tablename__ = "abacus_ops"
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    ops = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AbacusSnapshot(db.Model):
+    """Full box state at a version, so old versions replay from here instead of from zero."""
+    __tablename__ = "abacus_snapshots"
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    state = db.Column(db.LargeBinary, nullable=False)
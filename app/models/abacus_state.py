@@ -0,0 +1,15 @@
+from datetime import datetime
+from .db import db, environment, SCHEMA
+
+
+class AbacusState(db.Model):
+    __tablename__ = "abacus_states"
+
+    if environment == "production":
+        __table_args__ = {'schema': SCHEMA}
+
+    # "user:<id>" for logged-in users, "session:<token>" otherwise
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    state = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
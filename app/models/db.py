@@ -1,11 +1,142 @@
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, session
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
 
 import os
 environment = os.getenv("FLASK_ENV")
 SCHEMA = os.environ.get("SCHEMA")
 
+REPLICA_BIND = "replica"
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs made inside a `read_replica` view to the
+    replica bind (SQLALCHEMY_BINDS["replica"]), when one is configured and
+    the client has not written within DB_REPLICA_MAX_LAG seconds.
+    Everything else, including flushes, goes to the primary.
+
+    The time of the client's last write rides in its session cookie, so it
+    reads its own writes whichever worker serves the next request. Views
+    that read from the replica set g.db_replica_reads.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+            and has_request_context()
+            and g.get("db_read_replica")
+            and REPLICA_BIND in self._db.engines
+            and time.time() - session.get("db_last_write", 0) > current_app.config["DB_REPLICA_MAX_LAG"]
+        ):
+            g.db_replica_reads = True
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _record_write(db_session, flush_context):
+    if has_request_context():
+        session["db_last_write"] = time.time()
+
+
+def read_replica(view):
+    """Let the view's reads go to the read replica (see RoutingSession)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_replica = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_replica = False
+    return wrapper
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that counts checkouts and how long callers waited for one.
+
+    The wait includes opening a new connection when the pool has room to
+    grow, and TimeoutError is counted when DB_POOL_TIMEOUT runs out.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        waited = time.perf_counter() - start
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return conn
+
+    def recreate(self):
+        # Keep the counters across dispose()/recreate so they stay monotonic
+        pool = super().recreate()
+        pool.checkouts, pool.timeouts = self.checkouts, self.timeouts
+        pool.wait_seconds, pool.max_wait_seconds = self.wait_seconds, self.max_wait_seconds
+        return pool
+
+
+def pool_stats():
+    """Checkout counters and current occupancy of every engine's pool"""
+    stats = {}
+    for key, engine in db.engines.items():
+        pool = engine.pool
+        name = key or "primary"
+        if isinstance(pool, QueuePool):
+            stats[f"{name}_size"] = pool.size()
+            stats[f"{name}_checked_out"] = pool.checkedout()
+            stats[f"{name}_overflow"] = max(pool.overflow(), 0)
+        if isinstance(pool, TimedQueuePool):
+            stats[f"{name}_checkouts"] = pool.checkouts
+            stats[f"{name}_timeouts"] = pool.timeouts
+            stats[f"{name}_wait_seconds"] = round(pool.wait_seconds, 6)
+            stats[f"{name}_max_wait_seconds"] = round(pool.max_wait_seconds, 6)
+    return stats
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _statement_timeout(session, transaction, connection):
+    # Bound every statement a request runs; CLI commands (imports, bulk
+    # seeds) are left without a timeout. SET LOCAL ends with the transaction.
+    if connection.dialect.name == "postgresql" and has_request_context():
+        timeout = current_app.config.get("DB_STATEMENT_TIMEOUT", 0)
+        if timeout:
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+def conflict_insert(table):
+    """INSERT with an ON CONFLICT clause on the primary, or None where unsupported"""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    return None
 
-db = SQLAlchemy()
 
 # helper function for adding prefix to foreign key column references in production
 def add_prefix_for_prod(attr):
@@ -13,3 +144,4 @@ def add_prefix_for_prod(attr):
         return f"{SCHEMA}.{attr}"
     else:
         return attr
+
@@ -1,5 +1,7 @@
 from datetime import datetime
 from .db import db, environment, SCHEMA, add_prefix_for_prod
+from app.metrics import timed
+from app.uploads import thumbnail_url
 
 
 class Project(db.Model):
@@ -19,14 +21,37 @@ class Project(db.Model):
     # Relationship to user
     owner = db.relationship("User", backref="projects")
 
+    @timed("project")
     def to_dict(self):
         return {
             "id": self.id,
             "name": self.name,
             "image_url": self.image_url,
+            "thumbnail_url": thumbnail_url(self.image_url),
             "description": self.description or "",
             "user_id": self.user_id,
             "owner": self.owner.username if self.owner else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    @timed("project")
+    def listing_dict(row):
+        """Same payload as to_dict, built from a LISTING_COLUMNS row"""
+        return {
+            "id": row.id,
+            "name": row.name,
+            "image_url": row.image_url,
+            "thumbnail_url": thumbnail_url(row.image_url),
+            "description": row.description or "",
+            "user_id": row.user_id,
+            "owner": row.owner,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None,
+        }
+
+
+# Keyset pagination walks projects newest first on (updated_at, id)
+db.Index("ix_projects_updated_at_id", Project.updated_at, Project.id)
+db.Index("ix_projects_user_id_updated_at_id", Project.user_id, Project.updated_at, Project.id)
@@ -0,0 +1,83 @@
+import re
+from sqlalchemy import DDL, event, func, literal, literal_column, or_, select, text, true
+from .db import db
+from .project import Project
+
+# Indexed document for Postgres full-text search; the query below must use
+# the same expression so the planner can match it against the GIN index.
+PG_DOCUMENT = "coalesce(name, '') || ' ' || coalesce(description, '')"
+
+# The trigram tokenizer indexes every three-character window, so a quoted
+# query matches anywhere inside a value, as ILIKE '%q%' would
+TRIGRAM = 3
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5("
+    "name, description, content='projects', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS projects_fts_ai AFTER INSERT ON projects BEGIN "
+    "INSERT INTO projects_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS projects_fts_ad AFTER DELETE ON projects BEGIN "
+    "INSERT INTO projects_fts(projects_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS projects_fts_au AFTER UPDATE ON projects BEGIN "
+    "INSERT INTO projects_fts(projects_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO projects_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_projects_search ON %(fullname)s "
+    f"USING GIN (to_tsvector('english', {PG_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS ix_projects_name_trgm ON %(fullname)s USING GIN (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_projects_description_trgm ON %(fullname)s USING GIN (description gin_trgm_ops)",
+]
+
+# Databases built with db.create_all() get the search structures too
+for statement in SQLITE_DDL:
+    event.listen(Project.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRES_DDL:
+    event.listen(Project.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+# The FTS table isn't in the metadata; left behind, it would index the old rows
+event.listen(Project.__table__, "after_drop", DDL("DROP TABLE IF EXISTS projects_fts").execute_if(dialect="sqlite"))
+
+
+def _like_pattern(q):
+    return "%" + re.sub(r"([\\%_])", r"\\\1", q) + "%"
+
+
+def search_clause(q):
+    """Return (join, filter, score) to rank projects against the text q.
+
+    The engine is picked from the database dialect: a trigram FTS5 index on
+    SQLite, tsvector plus trigram indexes on Postgres, and a plain ILIKE
+    scan elsewhere. Every engine matches q anywhere inside the name or
+    description, the way ILIKE does. Lower scores rank first. `join` is a
+    (selectable, onclause) pair to join, or None.
+
+    A query shorter than a trigram has nothing to look up in the SQLite
+    index, so "mo" falls back to the LIKE scan there.
+    """
+    dialect = db.engine.dialect.name
+    pattern = _like_pattern(q)
+    substring = or_(Project.name.ilike(pattern, escape="\\"), Project.description.ilike(pattern, escape="\\"))
+
+    if dialect == "sqlite":
+        if len(q) < TRIGRAM:
+            return None, substring, literal(0)
+        match = '"' + q.replace('"', '""') + '"'
+        hits = (
+            select(literal_column("rowid").label("id"), literal_column("bm25(projects_fts)").label("score"))
+            .select_from(text("projects_fts"))
+            .where(text("projects_fts MATCH :match").bindparams(match=match))
+            .subquery("hits")
+        )
+        return (hits, hits.c.id == Project.id), true(), hits.c.score
+
+    if dialect == "postgresql":
+        document = literal_column(f"to_tsvector('english', {PG_DOCUMENT})")
+        tsquery = func.websearch_to_tsquery("english", q)
+        score = -(func.ts_rank(document, tsquery) + func.similarity(Project.name, q))
+        return None, or_(document.op("@@")(tsquery), substring), score
+
+    return None, substring, literal(0)
@@ -1,5 +1,6 @@
 from .db import db, environment, SCHEMA, add_prefix_for_prod
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.metrics import timed
+from app.passwords import hasher
 from flask_login import UserMixin
 
 
@@ -20,11 +21,15 @@ class User(db.Model, UserMixin):
 
     @password.setter
     def password(self, password):
-        self.hashed_password = generate_password_hash(password)
+        self.hashed_password = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password, password)
+        return hasher.verify(self.password, password)
 
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.hashed_password)
+
+    @timed("user")
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from app.metrics import timed
+from .user import User
+
+
+class UserIdentity(UserMixin):
+    """Read-only snapshot of a User, safe to keep between requests.
+
+    Flask-Login's current_user is one of these; views that need the ORM
+    object (relationships, writes) should load the User by id.
+    """
+
+    __slots__ = ("id", "username", "email")
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email)
+
+    @timed("user")
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'email': self.email
+        }
+
+
+class IdentityCache:
+    """LRU of UserIdentity by id with a TTL, for the Flask-Login loader.
+
+    Updates and deletes of a User evict its entry in this process; the TTL
+    bounds how long other workers can keep serving the old snapshot.
+    """
+
+    def __init__(self, max_size=4096, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.setdefault("USER_CACHE_SIZE", self.max_size)
+        self.ttl = app.config.setdefault("USER_CACHE_TTL", self.ttl)
+
+    def load(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        identity = UserIdentity.from_user(user)
+        if self.max_size:
+            with self._lock:
+                self._entries[user_id] = (identity, now + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+user_identities = IdentityCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_identity(mapper, connection, target):
+    user_identities.invalidate(target.id)
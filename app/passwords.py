@@ -0,0 +1,52 @@
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = "pbkdf2:sha256:260000"
+
+
+class PasswordHasher:
+    """Hashes and checks passwords on the calling thread.
+
+    The algorithm and cost come from PASSWORD_HASH_METHOD (any werkzeug
+    method string, e.g. "pbkdf2:sha256:600000"), and stored hashes of any
+    other method are upgraded on the next login (see needs_rehash).
+    hashlib's pbkdf2 releases the GIL while it works, so other request
+    threads keep running during a hash.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD):
+        self.method = method
+        self._shared = {}
+        self._prefixes = {}
+
+    def init_app(self, app):
+        self.method = app.config.setdefault("PASSWORD_HASH_METHOD", self.method)
+
+    def hash(self, password):
+        return generate_password_hash(password, self.method)
+
+    def verify(self, hashed, password):
+        return check_password_hash(hashed, password)
+
+    def _prefix(self, method):
+        # werkzeug fills in defaults ("pbkdf2:sha256" -> "pbkdf2:sha256:260000"),
+        # so ask it what the method writes rather than parse the string
+        if method not in self._prefixes:
+            self._prefixes[method] = generate_password_hash("", method, salt_length=1).split("$", 1)[0]
+        return self._prefixes[method]
+
+    def needs_rehash(self, hashed):
+        """True when hashed was made with a different method or cost"""
+        return hashed.split("$", 1)[0] != self._prefix(self.method)
+
+    def hash_once(self, password):
+        """Hash password once per process and hand back the same hash.
+
+        Only for bulk fixture data such as seeds: every user created this
+        way shares one salt.
+        """
+        if password not in self._shared:
+            self._shared[password] = self.hash(password)
+        return self._shared[password]
+
+
+hasher = PasswordHasher()
@@ -1,6 +1,8 @@
+import click
 from flask.cli import AppGroup
 from .users import seed_users, undo_users
 from .projects import seed_projects, undo_projects
+from .bulk import seed_bulk_users, seed_bulk_projects
 
 from app.models.db import db, environment, SCHEMA
 
@@ -23,6 +25,19 @@ def seed():
     seed_projects()
 
 
+# Creates the `flask seed bulk` command for load-testing datasets.
+# Rows go in with executemany batches of --chunk-size and are committed
+# chunk by chunk, so memory stays flat however many rows are requested.
+@seed_commands.command('bulk')
+@click.option('--users', default=0, show_default=True, help='Number of users to generate.')
+@click.option('--projects', default=0, show_default=True, help='Number of projects to generate.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows per insert batch.')
+@click.option('--seed', default=0, show_default=True, help='Random seed for generated projects.')
+def bulk(users, projects, chunk_size, seed):
+    seed_bulk_users(users, chunk_size, echo=click.echo)
+    seed_bulk_projects(projects, chunk_size, seed, echo=click.echo)
+
+
 # Creates the `flask seed undo` command
 @seed_commands.command('undo')
 def undo():
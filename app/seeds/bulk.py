@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.models import db, Project, User
+from app.passwords import hasher
+
+ADJECTIVES = ["Interactive", "Visual", "Collaborative", "Open", "Minimal", "Real-time", "Offline", "Personal"]
+TOPICS = ["Abacus", "Climate", "Recipe", "Finance", "Language", "Fitness", "Music", "Astronomy", "Chess", "Garden"]
+KINDS = ["Dashboard", "Tracker", "Platform", "Toolkit", "Explorer", "Planner", "Simulator", "Journal"]
+
+
+def _chunks(total, size):
+    start = 0
+    while start < total:
+        yield start, min(size, total - start)
+        start += size
+
+
+def _user_ids(chunk_size):
+    """Cycle through every user id forever, holding one chunk at a time"""
+    users = User.__table__
+    after = 0
+    while True:
+        ids = db.session.execute(
+            select(users.c.id).where(users.c.id > after).order_by(users.c.id).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            if not after:
+                raise RuntimeError("seed bulk needs at least one user to own projects")
+            after = 0
+            continue
+        yield from ids
+        after = ids[-1]
+
+
+def seed_bulk_users(count, chunk_size=5000, echo=print):
+    users = User.__table__
+    # Every generated user shares one precomputed hash of "password"
+    hashed = hasher.hash_once('password')
+    first = (db.session.execute(select(func.max(users.c.id))).scalar() or 0) + 1
+    for start, size in _chunks(count, chunk_size):
+        n = first + start
+        db.session.execute(users.insert(), [
+            {
+                "username": f"user{n + i}",
+                "email": f"user{n + i}@example.com",
+                "hashed_password": hashed,
+            }
+            for i in range(size)
+        ])
+        db.session.commit()
+        echo(f"users: {start + size}/{count}")
+
+
+def seed_bulk_projects(count, chunk_size=5000, seed=0, echo=print):
+    projects = Project.__table__
+    rng = random.Random(seed)
+    owners = _user_ids(chunk_size)
+    now = datetime.utcnow()
+    for start, size in _chunks(count, chunk_size):
+        rows = []
+        for _ in range(size):
+            topic = rng.choice(TOPICS)
+            created = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+            rows.append({
+                "name": f"{rng.choice(ADJECTIVES)} {topic} {rng.choice(KINDS)}",
+                "description": f"A {topic.lower()} project generated for load testing.",
+                "image_url": f"https://picsum.photos/seed/{rng.randint(1, 10**6)}/400/300",
+                "user_id": next(owners),
+                "created_at": created,
+                "updated_at": created + timedelta(seconds=rng.randint(0, 30 * 24 * 3600)),
+            })
+        db.session.execute(projects.insert(), rows)
+        db.session.commit()
+        echo(f"projects: {start + size}/{count}")
@@ -1,4 +1,5 @@
 from app.models import db, Project, User, environment, SCHEMA
+from app.passwords import hasher
 from sqlalchemy.sql import text
 
 
@@ -13,7 +14,7 @@ def seed_projects():
         user1 = User(
             username='Demo',
             email='demo@demo.com',
-            password='password'
+            hashed_password=hasher.hash_once('password')
         )
         db.session.add(user1)
     
@@ -21,7 +22,7 @@ def seed_projects():
         user2 = User(
             username='marnie',
             email='marnie@demo.com', 
-            password='password'
+            hashed_password=hasher.hash_once('password')
         )
         db.session.add(user2)
         
@@ -29,7 +30,7 @@ def seed_projects():
         user3 = User(
             username='bobbie',
             email='bobbie@demo.com',
-            password='password'
+            hashed_password=hasher.hash_once('password')
         )
         db.session.add(user3)
     
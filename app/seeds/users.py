@@ -1,15 +1,16 @@
 from app.models import db, User, environment, SCHEMA
+from app.passwords import hasher
 from sqlalchemy.sql import text
 
 
 # Adds a demo user, you can add other users here if you want
 def seed_users():
     demo = User(
-        username='Demo', email='demo@aa.io', password='password')
+        username='Demo', email='demo@aa.io', hashed_password=hasher.hash_once('password'))
     marnie = User(
-        username='marnie', email='marnie@aa.io', password='password')
+        username='marnie', email='marnie@aa.io', hashed_password=hasher.hash_once('password'))
     bobbie = User(
-        username='bobbie', email='bobbie@aa.io', password='password')
+        username='bobbie', email='bobbie@aa.io', hashed_password=hasher.hash_once('password'))
 
     db.session.add(demo)
     db.session.add(marnie)
@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import current_app, request, send_file
+
+# Vite puts a content hash in every emitted asset name: index-46c9748d.js
+HASHED_NAME = re.compile(r"-[0-9a-f]{8,}\.[a-z0-9]+$")
+COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map", ".ico"}
+MIN_COMPRESS_SIZE = 1024
+# Files above this are streamed from disk instead of held in memory
+MAX_MEMORY_SIZE = 2 * 1024 * 1024
+ONE_YEAR = 365 * 24 * 3600
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class _Asset:
+    __slots__ = ("path", "mimetype", "immutable", "variants")
+
+    def __init__(self, path, mimetype, immutable):
+        self.path = path
+        self.mimetype = mimetype
+        self.immutable = immutable
+        # encoding ("identity", "gzip", "br") -> (bytes or None, etag)
+        self.variants = {}
+
+
+class StaticAssets:
+    """In-memory manifest of the React build, indexed once at startup.
+
+    Every file under the build folder is read once; compressible ones get
+    gzip (and brotli, when the brotli package is installed) variants, unless
+    the build already shipped .gz/.br siblings, which are used as-is.
+    Requests are answered from the manifest without touching the
+    filesystem, including the SPA fallback to index.html.
+    """
+
+    def __init__(self, folder=None):
+        self.folder = folder
+        self.assets = {}
+        self.debug = False
+        self._index_mtime = None
+
+    def init_app(self, app, folder):
+        self.folder = folder
+        self.debug = app.debug
+        self.load()
+
+    def load(self):
+        assets = {}
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                if filename.endswith((".gz", ".br")):
+                    continue
+                path = os.path.join(root, filename)
+                rel = os.path.relpath(path, self.folder).replace(os.sep, "/")
+                assets[rel] = self._index(path, filename)
+        self.assets = assets
+        self._index_mtime = self._mtime("index.html")
+
+    def _mtime(self, rel):
+        try:
+            return os.stat(os.path.join(self.folder, rel)).st_mtime
+        except OSError:
+            return None
+
+    def _index(self, path, filename):
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        asset = _Asset(path, mimetype, bool(HASHED_NAME.search(filename)))
+        if os.path.getsize(path) > MAX_MEMORY_SIZE:
+            asset.variants["identity"] = (None, None)
+            return asset
+
+        with open(path, "rb") as f:
+            data = f.read()
+        asset.variants["identity"] = (data, hashlib.sha256(data).hexdigest()[:32])
+
+        if os.path.splitext(filename)[1] in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE:
+            for encoding, suffix, compress in (
+                ("gzip", ".gz", lambda d: gzip.compress(d, 9, mtime=0)),
+                ("br", ".br", brotli.compress if brotli else None),
+            ):
+                if os.path.exists(path + suffix):
+                    with open(path + suffix, "rb") as f:
+                        packed = f.read()
+                elif compress is not None:
+                    packed = compress(data)
+                else:
+                    continue
+                if len(packed) < len(data):
+                    asset.variants[encoding] = (packed, f"{asset.variants['identity'][1]}-{encoding}")
+        return asset
+
+    def _negotiate(self, asset):
+        accepted = request.accept_encodings
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and accepted[encoding]:
+                return encoding
+        return "identity"
+
+    def serve(self, path):
+        # The dev build (npm run build --watch) rewrites index.html on every rebuild
+        if self.debug and self._mtime("index.html") != self._index_mtime:
+            self.load()
+
+        asset = self.assets.get(path) or self.assets.get("index.html")
+        if asset is None:
+            return {"errors": {"message": "Frontend build not found"}}, 404
+
+        encoding = self._negotiate(asset)
+        data, etag = asset.variants[encoding]
+        if data is None:
+            response = send_file(asset.path, mimetype=asset.mimetype, conditional=True)
+        else:
+            response = current_app.response_class(data, mimetype=asset.mimetype)
+            response.set_etag(etag)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        if len(asset.variants) > 1:
+            response.vary.add("Accept-Encoding")
+
+        if asset.immutable:
+            response.cache_control.public = True
+            response.cache_control.max_age = ONE_YEAR
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,118 @@
+import json
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, func, select, text
+
+from app.models import db, Project, User
+
+# Creates a projects group to hold the transfer commands
+# So we can type `flask projects --help`
+project_commands = AppGroup('projects')
+
+FIELDS = ("name", "image_url", "description", "user_id", "created_at", "updated_at")
+
+
+def _parse(line):
+    record = json.loads(line)
+    for key in ("created_at", "updated_at"):
+        record[key] = datetime.fromisoformat(record[key]) if record.get(key) else datetime.utcnow()
+    record.setdefault("description", "")
+    record.setdefault("image_url", None)
+    return record
+
+
+def _resolve_owners(records, on_skip=None):
+    """Point each record at a local user, by owner username when exported with one.
+
+    Records whose owner is not a local user are dropped and passed to on_skip.
+    """
+    names = {r["owner"] for r in records if r.get("owner")}
+    ids = {r.get("user_id") for r in records if not r.get("owner")}
+    users = User.__table__
+    owners = dict(db.session.execute(
+        select(users.c.username, users.c.id).where(users.c.username.in_(names))
+    ).all()) if names else {}
+    local_ids = set(db.session.execute(
+        select(users.c.id).where(users.c.id.in_(ids))
+    ).scalars()) if ids else set()
+    resolved = []
+    for r in records:
+        if r.get("owner"):
+            found = r["owner"] in owners
+            if found:
+                r["user_id"] = owners[r["owner"]]
+        else:
+            found = r.get("user_id") in local_ids
+        if found:
+            resolved.append(r)
+        elif on_skip is not None:
+            on_skip(r)
+    return resolved
+
+
+def import_projects(lines, chunk_size=1000, keep_ids=False, on_skip=None):
+    """Batch-upsert NDJSON project records, one chunk in memory at a time.
+
+    By default every record is inserted as a new project. With keep_ids,
+    records whose id already exists are updated in place and the rest are
+    inserted with their ids, which overwrites local projects that happen to
+    share an id. Records whose owner can't be found locally are skipped and
+    passed to on_skip. Returns (written, skipped) counts.
+    """
+    projects = Project.__table__
+    written = skipped = 0
+    lines = (line for line in lines if line.strip())
+    while True:
+        records = [_parse(line) for line in islice(lines, chunk_size)]
+        if not records:
+            break
+        resolved = _resolve_owners(records, on_skip)
+        skipped += len(records) - len(resolved)
+
+        if keep_ids:
+            ids = [r["id"] for r in resolved]
+            existing = set(db.session.execute(
+                select(projects.c.id).where(projects.c.id.in_(ids))
+            ).scalars())
+            updates = [dict({f: r[f] for f in FIELDS}, b_id=r["id"]) for r in resolved if r["id"] in existing]
+            inserts = [dict({f: r[f] for f in FIELDS}, id=r["id"]) for r in resolved if r["id"] not in existing]
+            if updates:
+                db.session.execute(
+                    projects.update().where(projects.c.id == bindparam("b_id")),
+                    updates,
+                )
+        else:
+            inserts = [{f: r[f] for f in FIELDS} for r in resolved]
+        if inserts:
+            db.session.execute(projects.insert(), inserts)
+        db.session.commit()
+        written += len(resolved)
+
+    if keep_ids and db.engine.dialect.name == "postgresql":
+        # Explicit ids bypass the sequence; move it past the highest id
+        db.session.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, 'id'), :max_id)"),
+            {"table": projects.fullname, "max_id": db.session.execute(select(func.max(projects.c.id))).scalar() or 1},
+        )
+        db.session.commit()
+    return written, skipped
+
+
+# Creates the `flask projects import` command
+@project_commands.command('import')
+@click.argument('source', type=click.File('r'), default='-')
+@click.option('--chunk-size', default=1000, show_default=True, help='Records per upsert batch.')
+@click.option('--keep-ids/--new-ids', default=False, show_default=True,
+              help='Upsert on the exported ids (overwriting local projects with the same id), '
+                   'or insert every record as a new project.')
+def import_command(source, chunk_size, keep_ids):
+    """Import projects from an NDJSON file (or stdin) made by GET /api/projects/export."""
+    def report(record):
+        owner = record.get("owner") or f"user id {record.get('user_id')}"
+        click.echo(f"skipped project {record.get('id')} {record['name']!r}: owner {owner} not found", err=True)
+
+    written, skipped = import_projects(source, chunk_size, keep_ids, report)
+    click.echo(f"imported {written} projects, skipped {skipped} with unknown owners")
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import re
+import tempfile
+
+import click
+from flask import abort, send_file
+from flask.cli import AppGroup
+
+IMAGE_EXTENSIONS = {".jpg", ".png", ".gif", ".webp"}
+EXTENSION_ALIASES = {".jpeg": ".jpg"}
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+THUMBNAIL_WIDTH = 320
+ONE_YEAR = 365 * 24 * 3600
+
+# Content-addressed names: sha256 of the bytes plus the normalized extension
+OBJECT_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+def normalize_extension(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return EXTENSION_ALIASES.get(ext, ext)
+
+
+def thumbnail_url(image_url):
+    """Small variant of a stored upload; other URLs are returned unchanged"""
+    if image_url and image_url.startswith("/uploads/") and OBJECT_NAME.match(image_url[len("/uploads/"):]):
+        return f"{image_url}?w={THUMBNAIL_WIDTH}"
+    return image_url
+
+
+class UploadStore:
+    """Stores uploads under the sha256 of their bytes.
+
+    Writing the same bytes twice keeps a single object. Resized variants
+    are produced with Pillow on first request and kept next to the
+    originals; an upload Pillow can't read is served at its original size. Objects never change, so they are served with
+    year-long immutable caching, their digest as ETag, and Range support.
+    """
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def init_app(self, app):
+        self.root = app.config["UPLOAD_FOLDER"]
+
+    def object_path(self, name):
+        return os.path.join(self.root, "objects", name[:2], name)
+
+    def variant_path(self, name, width):
+        return os.path.join(self.root, "variants", str(width), name[:2], name)
+
+    def _publish(self, tmp_path, path):
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+
+    def save(self, stream, filename):
+        """Store the bytes read from stream and return the object name"""
+        ext = normalize_extension(filename)
+        if ext not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {ext or 'none'}")
+        digest = hashlib.sha256()
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                digest.update(chunk)
+                out.write(chunk)
+        name = digest.hexdigest() + ext
+        self._publish(tmp_path, self.object_path(name))
+        return name
+
+    def _variant(self, name, width):
+        path = self.variant_path(name, width)
+        if os.path.exists(path):
+            return path
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=os.path.splitext(name)[1])
+        os.close(fd)
+        try:
+            with Image.open(self.object_path(name)) as image:
+                image.thumbnail((width, width * 4))
+                image.save(tmp_path)
+        except (OSError, Image.DecompressionBombError):
+            # Corrupt or unreadable upload: serve the original instead
+            os.remove(tmp_path)
+            return None
+        self._publish(tmp_path, path)
+        return path
+
+    def serve(self, name, width=None):
+        path = self.object_path(name)
+        if not os.path.exists(path):
+            abort(404)
+        etag = name
+        if width is not None:
+            if width not in VARIANT_WIDTHS:
+                abort(400)
+            variant = self._variant(name, width)
+            if variant is not None:
+                path, etag = variant, f"{name}-w{width}"
+        response = send_file(path, etag=etag, conditional=True, max_age=ONE_YEAR)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+upload_store = UploadStore()
+
+# Creates an uploads group to hold the upload maintenance commands
+# So we can type `flask uploads --help`
+upload_commands = AppGroup('uploads')
+
+
+# Creates the `flask uploads migrate` command
+@upload_commands.command('migrate')
+def migrate():
+    """Move loose files in UPLOAD_FOLDER into the content-addressed store.
+
+    Projects whose image_url points at a moved file are rewritten to the
+    stored object, and the loose copy is removed.
+    """
+    from app.cache import project_cache
+    from app.models import db, Project
+
+    projects = Project.__table__
+    for filename in sorted(os.listdir(upload_store.root)):
+        path = os.path.join(upload_store.root, filename)
+        if not os.path.isfile(path) or normalize_extension(filename) not in IMAGE_EXTENSIONS:
+            continue
+        with open(path, "rb") as f:
+            name = upload_store.save(f, filename)
+        db.session.execute(
+            projects.update()
+            .where(projects.c.image_url == f"/uploads/{filename}")
+            .values(image_url=f"/uploads/{name}")
+        )
+        os.remove(path)
+        click.echo(f"{filename} -> {name}")
+    db.session.commit()
+    project_cache.invalidate()
@@ -0,0 +1,25 @@
+"""Add project listing indexes
+
+Revision ID: 003_project_listing_indexes
+Revises: 002_abacus_states
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '003_project_listing_indexes'
+down_revision = '002_abacus_states'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_projects_updated_at_id', 'projects', ['updated_at', 'id'])
+    op.create_index('ix_projects_user_id_updated_at_id', 'projects', ['user_id', 'updated_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_projects_user_id_updated_at_id', table_name='projects')
+    op.drop_index('ix_projects_updated_at_id', table_name='projects')
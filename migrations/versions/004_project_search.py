@@ -0,0 +1,60 @@
+"""Add full-text project search
+
+Revision ID: 004_project_search
+Revises: 003_project_listing_indexes
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '004_project_search'
+down_revision = '003_project_listing_indexes'
+branch_labels = None
+depends_on = None
+
+DOCUMENT = "coalesce(name, '') || ' ' || coalesce(description, '')"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX ix_projects_search ON projects USING GIN (to_tsvector('english', {DOCUMENT}))")
+        op.execute("CREATE INDEX ix_projects_name_trgm ON projects USING GIN (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_projects_description_trgm ON projects USING GIN (description gin_trgm_ops)")
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE projects_fts USING fts5("
+            "name, description, content='projects', content_rowid='id')"
+        )
+        op.execute(
+            "CREATE TRIGGER projects_fts_ai AFTER INSERT ON projects BEGIN "
+            "INSERT INTO projects_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER projects_fts_ad AFTER DELETE ON projects BEGIN "
+            "INSERT INTO projects_fts(projects_fts, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER projects_fts_au AFTER UPDATE ON projects BEGIN "
+            "INSERT INTO projects_fts(projects_fts, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); "
+            "INSERT INTO projects_fts(rowid, name, description) VALUES (new.id, new.name, new.description); END"
+        )
+        op.execute("INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_projects_description_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_projects_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_projects_search")
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS projects_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS projects_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS projects_fts_ai")
+        op.execute("DROP TABLE IF EXISTS projects_fts")
@@ -0,0 +1,37 @@
+"""Add abacus_ops and abacus_snapshots tables
+
+Revision ID: 005_abacus_history
+Revises: 004_project_search
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_abacus_history'
+down_revision = '004_project_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('abacus_ops',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('ops', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'version')
+    )
+    op.create_table('abacus_snapshots',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('state', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'version')
+    )
+
+
+def downgrade():
+    op.drop_table('abacus_snapshots')
+    op.drop_table('abacus_ops')
@@ -0,0 +1,35 @@
+"""Index SQLite project search by trigram for substring matches
+
+Revision ID: 006_project_search_trigram
+Revises: 005_abacus_history
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '006_project_search_trigram'
+down_revision = '005_abacus_history'
+branch_labels = None
+depends_on = None
+
+
+def _recreate_fts(tokenize):
+    # The triggers only name the table, so they keep working across the swap
+    op.execute("DROP TABLE IF EXISTS projects_fts")
+    op.execute(
+        "CREATE VIRTUAL TABLE projects_fts USING fts5("
+        f"name, description, content='projects', content_rowid='id'{tokenize})"
+    )
+    op.execute("INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')")
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _recreate_fts(", tokenize='trigram'")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        _recreate_fts("")
@@ -23,6 +23,18 @@ const api = async (path, opts = {}) => {
   return r.json();
 };
 
+// Apply a `diff` event from /api/abacus/stream: changed rows (0 = emptied),
+// plus width/divider when they changed
+const applyDiff = (state, diff) => {
+  const rows = new Map(state.rows);
+  diff.rows.forEach(([yy, c]) => (c ? rows.set(yy, c) : rows.delete(yy)));
+  return {
+    width: diff.width ?? state.width,
+    divider: diff.divider ?? state.divider,
+    rows: [...rows].sort((a, b) => a[0] - b[0]),
+  };
+};
+
 /* ===== Shared sizing (keeps base aligned) ===== */
 const MAX_ROWS = 16;  // visible rows; legal y = 0..MAX_ROWS-1
 const cell = 20;      // px for square cell (width & height)
@@ -51,10 +63,29 @@ export default function AbacusBox() {
   // Sum from Interpreter 1 (computed by the <Interpreter /> component)
   const [sum1, setSum1] = useState(0);
 
-  // Load server state once on mount
   const refresh = () => api("/state").then(setState);
+
+  // Load server state once on mount. When the server can hold event streams
+  // (ASGI mode), subscribe too: the stream sends the whole box once, then a
+  // diff per change from this tab or any other. Otherwise each action below
+  // sets the state from its own response.
   useEffect(() => {
-    refresh();
+    let source = null;
+    let closed = false;
+    fetch("/api/abacus/state", { credentials: "same-origin" })
+      .then(async (r) => {
+        if (!r.ok) throw new Error(`api /state failed (${r.status})`);
+        setState(await r.json());
+        if (closed || r.headers.get("X-Abacus-Streaming") !== "1") return;
+        source = new EventSource("/api/abacus/stream", { withCredentials: true });
+        source.addEventListener("state", (e) => setState(JSON.parse(e.data)));
+        source.addEventListener("diff", (e) => setState((prev) => applyDiff(prev, JSON.parse(e.data))));
+      })
+      .catch((err) => console.error(err));
+    return () => {
+      closed = true;
+      if (source) source.close();
+    };
   }, []);
 
   const init = async () =>
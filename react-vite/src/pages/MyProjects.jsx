@@ -21,6 +21,8 @@ const api = async (path, opts = {}) => {
 
 export default function MyProjects() {
   const [projects, setProjects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
   const [name, setName] = useState("");
   const [imageUrl, setImageUrl] = useState("");
   const [description, setDescription] = useState("");
@@ -35,17 +37,22 @@ export default function MyProjects() {
     return <Navigate to="/" replace />;
   }
 
-  const refresh = async () => {
+  // Appends the page after cursor, or starts over without one
+  const loadPage = async (cursor) => {
+    setLoading(true);
     try {
-      const d = await api("/my-projects");
-      setProjects(d.projects || []);
+      const d = await api(`/my-projects${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""}`);
+      setProjects((prev) => (cursor ? [...prev, ...(d.projects || [])] : d.projects || []));
+      setNextCursor(d.next_cursor);
     } catch (err) {
       console.error("Failed to fetch my projects:", err);
+    } finally {
+      setLoading(false);
     }
   };
 
   useEffect(() => {
-    refresh();
+    loadPage(null);
   }, []);
 
   const sorted = useMemo(
@@ -218,7 +225,7 @@ export default function MyProjects() {
               <div className="thumb">
                 {project.image_url ? (
                   <img 
-                    src={project.image_url} 
+                    src={project.thumbnail_url || project.image_url} 
                     alt={project.name}
                     onError={(e) => {
                       e.target.style.display = 'none';
@@ -264,12 +271,20 @@ export default function MyProjects() {
             </article>
           ))}
 
-          {sorted.length === 0 && (
+          {sorted.length === 0 && !loading && (
             <div className="empty-state">
               You haven't created any projects yet. Create your first project to get started!
             </div>
           )}
         </div>
+
+        {nextCursor && (
+          <div className="load-more">
+            <button className="btn btn-outline" onClick={() => loadPage(nextCursor)} disabled={loading}>
+              {loading ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
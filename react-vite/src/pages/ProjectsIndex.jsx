@@ -21,6 +21,8 @@ const api = async (path, opts = {}) => {
 
 export default function ProjectsIndex({ searchQuery = "" }) {
   const [projects, setProjects] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loading, setLoading] = useState(false);
   const [name, setName] = useState("");
   const [imageUrl, setImageUrl] = useState("");
   const [description, setDescription] = useState("");
@@ -29,31 +31,56 @@ export default function ProjectsIndex({ searchQuery = "" }) {
   
   const user = useSelector((state) => state.session.user);
 
-  const refresh = async () => {
+  const query = searchQuery.trim();
+
+  // One page of the listing, or of /search results when there is a query
+  const fetchPage = (cursor) => {
+    const params = new URLSearchParams();
+    if (query) params.set("q", query);
+    if (cursor) params.set("cursor", cursor);
+    const qs = params.toString();
+    return api(`${query ? "/search" : ""}${qs ? `?${qs}` : ""}`);
+  };
+
+  useEffect(() => {
+    let stale = false;
+    // Wait for typing to pause before searching
+    const timer = setTimeout(async () => {
+      setLoading(true);
+      try {
+        const d = await fetchPage(null);
+        if (stale) return;
+        setProjects(d.projects || []);
+        setNextCursor(d.next_cursor);
+      } catch (err) {
+        console.error("Failed to fetch projects:", err);
+      } finally {
+        if (!stale) setLoading(false);
+      }
+    }, query ? 250 : 0);
+    return () => {
+      stale = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
+  const loadMore = async () => {
+    setLoading(true);
     try {
-      const d = await api("");
-      setProjects(d.projects || []);
+      const d = await fetchPage(nextCursor);
+      setProjects((prev) => [...prev, ...(d.projects || [])]);
+      setNextCursor(d.next_cursor);
     } catch (err) {
       console.error("Failed to fetch projects:", err);
+    } finally {
+      setLoading(false);
     }
   };
 
-  useEffect(() => {
-    refresh();
-  }, []);
-
-  // Filter projects by search query
-  const filteredProjects = useMemo(() => {
-    if (!searchQuery.trim()) return projects;
-    return projects.filter(project => 
-      project.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      (project.description && project.description.toLowerCase().includes(searchQuery.toLowerCase()))
-    );
-  }, [projects, searchQuery]);
-
+  // Search results keep the server's ranking
   const sorted = useMemo(
-    () => [...filteredProjects].sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at)),
-    [filteredProjects]
+    () => query ? projects : [...projects].sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at)),
+    [projects, query]
   );
 
   const create = async (e) => {
@@ -184,7 +211,7 @@ export default function ProjectsIndex({ searchQuery = "" }) {
 
         {searchQuery && (
           <div className="search-results">
-            Found {sorted.length} project{sorted.length !== 1 ? 's' : ''} for "{searchQuery}"
+            Found {sorted.length}{nextCursor ? '+' : ''} project{sorted.length !== 1 ? 's' : ''} for "{searchQuery}"
           </div>
         )}
 
@@ -194,7 +221,7 @@ export default function ProjectsIndex({ searchQuery = "" }) {
             <div className="thumb">
               {project.image_url ? (
                 <img 
-                  src={project.image_url} 
+                  src={project.thumbnail_url || project.image_url} 
                   alt={project.name}
                   onError={(e) => {
                     e.target.style.display = 'none';
@@ -237,7 +264,7 @@ export default function ProjectsIndex({ searchQuery = "" }) {
           </article>
         ))}
 
-          {sorted.length === 0 && (
+          {sorted.length === 0 && !loading && (
             <div className="empty-state">
               {searchQuery 
                 ? `No projects found matching "${searchQuery}"`
@@ -246,6 +273,14 @@ export default function ProjectsIndex({ searchQuery = "" }) {
             </div>
           )}
         </div>
+
+        {nextCursor && (
+          <div className="load-more">
+            <button className="btn btn-outline" onClick={loadMore} disabled={loading}>
+              {loading ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+import pytest
+
+# app reads its configuration from the environment at import time
+_db_dir = tempfile.mkdtemp(prefix="easy-abacus-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+
+from app import app as flask_app  # noqa: E402
+from app.abacus import box_states  # noqa: E402
+from app.cache import project_cache  # noqa: E402
+from app.models import db, User, user_identities  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    # Caches outlive the tables, so drop what they remember about this test
+    box_states.flush()
+    box_states._entries.clear()
+    user_identities._entries.clear()
+    project_cache.invalidate()
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app):
+    """A new test client logged in as an existing user"""
+    def login(username):
+        client = app.test_client()
+        response = client.post("/api/auth/login", json={"email": f"{username}@example.com", "password": "password"})
+        assert response.status_code == 200, response.get_json()
+        return client
+
+    return login
+
+
+@pytest.fixture
+def make_user(app, login):
+    """Create a user and return a test client logged in as them"""
+    count = 0
+
+    def make(username=None):
+        nonlocal count
+        count += 1
+        username = username or f"user{count}"
+        with app.app_context():
+            db.session.add(User(username=username, email=f"{username}@example.com", password="password"))
+            db.session.commit()
+        return login(username)
+
+    return make
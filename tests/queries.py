@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.models import db
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements run on db.engine inside the block.
+
+    Yields the list the statements are appended to, so tests can pin an
+    endpoint to a constant number of queries:
+
+        with count_queries() as queries:
+            client.get("/api/projects")
+        assert len(queries) == 1
+    """
+    queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        queries.append(statement)
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block runs more than `limit` SQL statements."""
+    with count_queries() as queries:
+        yield queries
+    assert len(queries) <= limit, f"expected at most {limit} queries, ran {len(queries)}:\n" + "\n".join(queries)
@@ -0,0 +1,60 @@
+import threading
+
+WRITERS = 4
+ADDS_PER_WRITER = 25
+
+
+def test_concurrent_writers_lose_no_updates(make_user, login):
+    owner = make_user("owner")
+    assert owner.post("/api/abacus/init", json={"base": 1000}).status_code == 200
+    writers = [login("owner") for _ in range(WRITERS)]
+    reader = login("owner")
+
+    failures = []
+    done = threading.Event()
+
+    def write(client):
+        try:
+            for _ in range(ADDS_PER_WRITER):
+                response = client.post("/api/abacus/add", json={"y": 0, "k": 1})
+                if response.status_code != 200:
+                    failures.append(response.get_json())
+        except Exception as e:  # surfaced by the assertions below
+            failures.append(e)
+
+    def read():
+        # Every read sees a whole published version: the count only grows and
+        # always matches the version it was published as
+        last = 0
+        try:
+            while not done.is_set():
+                response = reader.get("/api/abacus/state")
+                version = int(response.headers["X-Abacus-Version"])
+                rows = dict(response.get_json()["rows"])
+                count = rows.get(0, 0)
+                if count != version - 1 or count < last:
+                    failures.append((version, rows))
+                last = count
+        except Exception as e:
+            failures.append(e)
+
+    threads = [threading.Thread(target=write, args=(client,)) for client in writers]
+    watcher = threading.Thread(target=read)
+    watcher.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    watcher.join()
+
+    assert failures == []
+    total = WRITERS * ADDS_PER_WRITER
+    state = owner.get("/api/abacus/state")
+    assert state.get_json()["rows"] == [[0, total]]
+    assert state.headers["X-Abacus-Version"] == str(total + 1)
+
+    history = owner.get(f"/api/abacus/history?limit={total + 10}").get_json()
+    assert history["version"] == total + 1
+    assert [entry["version"] for entry in history["entries"]] == list(range(1, total + 2))
+    assert [entry["ops"][0]["op"] for entry in history["entries"]] == ["init"] + ["add"] * total
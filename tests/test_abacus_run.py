@@ -0,0 +1,25 @@
+from app.api.abacus_routes import MAX_SNAPSHOT_OPS
+
+
+def adds(n):
+    return [{"op": "add", "y": y, "k": 1} for y in range(n)]
+
+
+def test_run_returns_a_snapshot_per_step(client):
+    client.post("/api/abacus/init", json={"base": 10})
+    response = client.post("/api/abacus/run", json={"ops": adds(3), "snapshots": True})
+    assert [len(s["rows"]) for s in response.get_json()["snapshots"]] == [1, 2, 3]
+
+
+def test_run_with_snapshots_takes_fewer_ops(client):
+    response = client.post("/api/abacus/run", json={"ops": adds(MAX_SNAPSHOT_OPS + 1), "snapshots": True})
+    assert response.status_code == 400
+    assert client.post("/api/abacus/run", json={"ops": adds(MAX_SNAPSHOT_OPS + 1)}).status_code == 200
+
+
+def test_run_rejects_snapshots_past_the_row_limit_and_publishes_nothing(client):
+    client.post("/api/abacus/init", json={"base": 10})
+    response = client.post("/api/abacus/run", json={"ops": adds(MAX_SNAPSHOT_OPS), "snapshots": True})
+    assert response.status_code == 400
+    assert "rows in total" in response.get_json()["errors"]["ops"]
+    assert client.get("/api/abacus/state").get_json()["rows"] == []
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from app.abacus import Box, box_states
+from app.abacus.history import DbHistoryStore, History, MemoryHistoryStore, encode_ops
+from app.abacus.state import BoxCache, DbStateStore, MemoryStateStore, VersionConflict
+
+
+@pytest.fixture(params=["memory", "db"])
+def stores(request, app):
+    """(state store, history store) of one kind, inside an app context"""
+    with app.app_context():
+        if request.param == "memory":
+            yield MemoryStateStore(), MemoryHistoryStore()
+        else:
+            yield DbStateStore(), DbHistoryStore()
+
+
+def state(width):
+    return {"storage": "dict", "width": width, "divider": width, "rows": []}
+
+
+def test_save_many_keeps_the_first_write_of_a_version(stores):
+    store, _ = stores
+    store.save_many([("k", 1, state(4))])
+    store.save_many([("k", 1, state(9))])
+    assert store.load("k") == (1, state(4))
+    store.save_many([("k", 2, state(9))])
+    store.save_many([("k", 1, state(4))])
+    assert store.load("k") == (2, state(9))
+
+
+def test_save_many_from_racing_workers(app, stores):
+    store, _ = stores
+    errors = []
+
+    def save(width):
+        try:
+            with app.app_context():
+                store.save_many([("k", 1, state(width))])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(width,)) for width in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    version, saved = store.load("k")
+    assert version == 1 and 1 <= saved["width"] <= 8
+
+
+def test_append_many_reports_the_keys_that_lost(stores):
+    _, log = stores
+    assert log.append_many([("a", 1, b"\x01", None), ("b", 1, b"\x01", None)]) == set()
+    assert log.append_many([("a", 1, b"\x02", None), ("a", 2, b"\x02", None), ("c", 1, b"\x02", None)]) == {"a"}
+    assert [ops for _, ops, _ in log.ops_between("a", 0, 5)] == [b"\x01"]
+    assert [ops for _, ops, _ in log.ops_between("c", 0, 5)] == [b"\x02"]
+
+
+def test_put_refuses_a_version_another_worker_published_first(stores):
+    store, log = stores
+    first, second = (BoxCache(store, history=History(log)) for _ in range(2))
+    for cache in (first, second):
+        cache.get("k")
+    first.put("k", Box.init(base=5), 1, [("init", 5, "dict")])
+    with pytest.raises(VersionConflict):
+        second.put("k", Box.init(base=10), 1, [("init", 10, "dict")])
+    # The winner's state isn't saved yet; the loser reloads it from the log
+    box, version = second.get("k")
+    assert (box.W, version) == (4, 1)
+    first.flush()
+    second.flush()
+    assert store.load("k")[0] == 1
+    assert [entry[1] for entry in History(log).log("k", 0, 10)] == [[("init", 5, "dict")]]
+
+
+def test_a_lost_publish_reaches_the_client_as_a_conflict(app, make_user):
+    client = make_user("ann")
+    client.post("/api/abacus/init", json={"base": 10})
+    # Another worker publishes version 2 while this one still caches version 1
+    with app.app_context():
+        box_states.history.store.append_many([("user:1", 2, encode_ops([("add", 0, 1)]), None)])
+    response = client.post("/api/abacus/add", json={"y": 0, "k": 2})
+    assert response.status_code == 409
+    assert "version" in response.get_json()["errors"]
+    response = client.post("/api/abacus/add", json={"y": 0, "k": 2})
+    assert response.status_code == 200
+    assert response.headers["X-Abacus-Version"] == "3"
+    assert response.get_json()["rows"] == [[0, 3]]
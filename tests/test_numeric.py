@@ -0,0 +1,42 @@
+from fractions import Fraction
+
+import pytest
+
+from app.abacus import box_from_text, box_from_value, convert_value, format_box, format_value, parse_value
+
+
+@pytest.mark.parametrize("value, from_base, to_base, expected", [
+    ("255.5", 10, 16, "ff.8"),
+    ("0.1", 2, 10, "0.5"),
+    ("0.0001", 2, 10, "0.0625"),
+    ("0.5", 10, 6, "0.3"),
+    ("1.50", 10, 10, "1.5"),
+    ("007", 8, 8, "7"),
+    ("0.000", 10, 3, "0"),
+    ([1, 0, 0], 1000, 10, "1000000"),
+])
+def test_convert_value(value, from_base, to_base, expected):
+    assert convert_value(value, from_base, to_base) == expected
+    assert format_value(parse_value(value, from_base), to_base) == expected
+
+
+def test_long_fractions_without_a_finite_expansion_name_only_the_base():
+    # Putting the value itself in the message would hit the int-to-text limit
+    with pytest.raises(ValueError, match=r"^value has no finite expansion in base 5$"):
+        convert_value("0." + "0" * 5999 + "1", 10, 5)
+    with pytest.raises(ValueError, match=r"^value has no finite expansion in base 3$"):
+        format_value(Fraction(1, 10 ** 5000), 3)
+
+
+def test_long_values_round_trip():
+    text = "0." + "1" * 100000
+    assert convert_value(convert_value(text, 2, 10), 10, 2) == text
+    box = box_from_text(text, 2, 16)
+    assert box.rows == box_from_value(parse_value(text, 2), 16).rows
+    assert format_box(box) == convert_value(text, 2, 16)
+
+
+@pytest.mark.parametrize("value", [5, None, {"digits": "1"}])
+def test_parse_value_rejects_other_types(value):
+    with pytest.raises(ValueError):
+        parse_value(value, 10)
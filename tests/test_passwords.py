@@ -0,0 +1,16 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.passwords import PasswordHasher
+
+
+@pytest.mark.parametrize("method", ["pbkdf2:sha256:1000", "pbkdf2:sha256"])
+def test_hashes_of_the_configured_method_are_current(method):
+    hasher = PasswordHasher(method)
+    assert not hasher.needs_rehash(hasher.hash("secret"))
+
+
+def test_hashes_of_another_cost_need_rehashing():
+    hasher = PasswordHasher("pbkdf2:sha256:2000")
+    assert hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:1000"))
+    assert not hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:2000"))
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from flask import g
+
+from app.cache import ResponseCache, project_cache
+from app.models import db, Project, User
+from tests.queries import assert_max_queries, count_queries
+
+
+@pytest.fixture
+def projects(app):
+    """Add n demo projects, each with its own owner, and return their ids"""
+    def add(n):
+        with app.app_context():
+            start = User.query.count()
+            users = [User(username=f"owner{start + i}", email=f"owner{start + i}@example.com", password="password")
+                     for i in range(n)]
+            db.session.add_all(users)
+            db.session.flush()
+            added = [Project(name=f"Demo {u.username}", description="A demo project", user_id=u.id) for u in users]
+            db.session.add_all(added)
+            db.session.commit()
+            # The response cache would answer the next request without any SQL
+            project_cache.invalidate()
+            return [p.id for p in added]
+
+    return add
+
+
+@pytest.mark.parametrize("url", ["/api/projects", "/api/projects/search?q=demo"])
+def test_listing_queries_do_not_grow_with_the_page(app, client, projects, url):
+    projects(2)
+    with app.app_context(), count_queries() as few:
+        assert len(client.get(url).get_json()["projects"]) == 2
+    projects(20)
+    with app.app_context(), assert_max_queries(len(few)):
+        assert len(client.get(url).get_json()["projects"]) == 22
+
+
+def test_detail_loads_the_owner_with_the_project(app, client, projects):
+    project_id = projects(1)[0]
+    with app.app_context(), assert_max_queries(1):
+        assert client.get(f"/api/projects/{project_id}").get_json()["owner"] == "owner0"
+
+
+def test_cached_listing_runs_no_queries(app, client, projects):
+    projects(3)
+    client.get("/api/projects")
+    with app.app_context(), assert_max_queries(0):
+        assert client.get("/api/projects").status_code == 200
+
+
+def test_replica_reads_are_not_cached_right_after_an_invalidation(app):
+    cache, calls = ResponseCache("replica-test"), []
+
+    @cache.cached
+    def view():
+        calls.append(1)
+        g.db_replica_reads = True
+        return {"projects": []}
+
+    cache.invalidate()
+    for _ in range(2):
+        with app.test_request_context("/api/projects"):
+            assert view().status_code == 200
+    assert len(calls) == 2
+    # Once the replica has had time to catch up, its reads are cached again
+    cache.backend._counters["replica-test:invalidated_at"] = time.time() - app.config["DB_REPLICA_MAX_LAG"] - 1
+    for _ in range(2):
+        with app.test_request_context("/api/projects"):
+            view()
+    assert len(calls) == 3
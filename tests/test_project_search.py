@@ -0,0 +1,47 @@
+import pytest
+
+from app.cache import project_cache
+from app.models import db, Project, User
+
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        db.session.add(User(username="owner", email="owner@example.com", password="password"))
+        db.session.commit()
+        db.session.add_all([
+            Project(name="Demo board", description="", user_id=1),
+            Project(name="Base conversion", description="Practice with a demo abacus", user_id=1),
+            Project(name="Fractions", description="Halves and 50% off", user_id=1),
+        ])
+        db.session.commit()
+        project_cache.invalidate()
+
+
+def names(client, q):
+    return [p["name"] for p in client.get("/api/projects/search", query_string={"q": q}).get_json()["projects"]]
+
+
+@pytest.mark.usefixtures("catalog")
+@pytest.mark.parametrize("q, expected", [
+    ("demo", {"Demo board", "Base conversion"}),
+    ("conv", {"Base conversion"}),
+    # Substrings inside a word and across words match the way ILIKE does
+    ("ersio", {"Base conversion"}),
+    ("o bo", {"Demo board"}),
+    ("50%", {"Fractions"}),
+    ('"demo"', set()),
+    # Shorter than a trigram
+    ("mo", {"Demo board", "Base conversion"}),
+    ("%", {"Fractions"}),
+    ("zebra", set()),
+])
+def test_search_matches_substrings(client, q, expected):
+    assert set(names(client, q)) == expected
+
+
+@pytest.mark.usefixtures("catalog")
+def test_closer_matches_rank_first(client):
+    assert names(client, "board") == ["Demo board"]
+    assert names(client, "oar") == ["Demo board"]
+    assert names(client, "demo") == ["Demo board", "Base conversion"]
@@ -0,0 +1,41 @@
+import json
+
+from app.models import db, Project, User
+from app.transfer import import_projects
+
+
+def record(id, name, **fields):
+    return json.dumps({"id": id, "name": name, "image_url": None, **fields})
+
+
+def test_import_adds_new_projects_and_skips_unknown_owners(app):
+    with app.app_context():
+        db.session.add(User(username="local", email="local@example.com", password="password"))
+        db.session.commit()
+        db.session.add(Project(name="existing", user_id=1))
+        db.session.commit()
+
+        skipped = []
+        lines = [
+            record(1, "by owner", owner="local", user_id=77),
+            record(2, "unknown owner", owner="ghost", user_id=1),
+            record(3, "by user id", user_id=1),
+            record(4, "unknown user id", user_id=99),
+        ]
+        assert import_projects(lines, on_skip=skipped.append) == (2, 2)
+
+        assert [r["name"] for r in skipped] == ["unknown owner", "unknown user id"]
+        assert [(p.name, p.user_id) for p in Project.query.order_by(Project.id)] == [
+            ("existing", 1), ("by owner", 1), ("by user id", 1),
+        ]
+
+
+def test_import_fills_in_optional_fields(app):
+    with app.app_context():
+        db.session.add(User(username="local", email="local@example.com", password="password"))
+        db.session.commit()
+
+        assert import_projects([json.dumps({"id": 1, "name": "bare", "owner": "local"})]) == (1, 0)
+
+        project = Project.query.one()
+        assert (project.name, project.image_url, project.description) == ("bare", None, "")
@@ -0,0 +1,19 @@
+import io
+
+import pytest
+
+from app.uploads import UploadStore
+
+pytest.importorskip("PIL")
+
+
+def test_unreadable_upload_is_served_at_its_original_size(app, tmp_path):
+    store = UploadStore(str(tmp_path))
+    name = store.save(io.BytesIO(b"not really a png"), "broken.png")
+    with app.test_request_context():
+        response = store.serve(name, 320)
+        response.direct_passthrough = False
+        assert response.status_code == 200
+        assert response.get_data() == b"not really a png"
+        response.close()
+    assert not list((tmp_path / "tmp").iterdir())